@@ -6,8 +6,107 @@ load_dotenv()
 
 # Gemini API key
 GEMINI_API_KEY = os.getenv("GEMINI_API_KEY")
+GEMINI_MODEL_NAME = os.getenv("GEMINI_MODEL_NAME", "gemini-2.0-flash")
 
 # Embedding and chunking configs
-CHUNK_SIZE = 200          # words per chunk
-CHUNK_OVERLAP = 20        # overlap in words
+CHUNK_MAX_TOKENS = int(os.getenv("CHUNK_MAX_TOKENS", "240"))         # tokenizer tokens per chunk (MiniLM limit is 256 incl. special tokens)
+CHUNK_OVERLAP_TOKENS = int(os.getenv("CHUNK_OVERLAP_TOKENS", "40"))   # trailing sentences carried into the next chunk
 EMBEDDING_DIM = 384       # MiniLM vector size
+EMBEDDING_MODEL_NAME = os.getenv("EMBEDDING_MODEL_NAME", "all-MiniLM-L6-v2")
+EMBEDDING_BACKEND = os.getenv("EMBEDDING_BACKEND", "sentence-transformers")  # sentence-transformers | onnx | onnx-int8
+EMBEDDING_ONNX_DIR = os.getenv("EMBEDDING_ONNX_DIR")                      # local model.onnx + tokenizer.json (else HF hub)
+EMBEDDING_THREADS = int(os.getenv("EMBEDDING_THREADS", "0"))              # ONNX intra-op threads, 0 = auto
+WARMUP_RETRY_BASE = float(os.getenv("WARMUP_RETRY_BASE", "2"))            # seconds before the first warm-up retry, doubled per retry
+WARMUP_RETRY_MAX = float(os.getenv("WARMUP_RETRY_MAX", "60"))             # cap on the wait between retries
+
+# Background ingestion (upload jobs)
+INGEST_WORKERS = int(os.getenv("INGEST_WORKERS", "2"))              # concurrent ingestion jobs
+INGEST_QUEUE_SIZE = int(os.getenv("INGEST_QUEUE_SIZE", "16"))       # pending jobs before 429
+INGEST_JOB_RETENTION = int(os.getenv("INGEST_JOB_RETENTION", "500"))  # finished jobs kept for polling
+INGEST_EMBED_BATCH = int(os.getenv("INGEST_EMBED_BATCH", "64"))     # chunks per encode call / upsert request
+UPSERT_PARALLELISM = int(os.getenv("UPSERT_PARALLELISM", "4"))       # concurrent upsert requests per document
+
+# Query-time retrieval
+QUERY_ENCODE_WORKERS = int(os.getenv("QUERY_ENCODE_WORKERS", "2"))  # threads dedicated to query embedding
+EMBED_BATCH_MAX_SIZE = int(os.getenv("EMBED_BATCH_MAX_SIZE", "32"))           # queries per encode call
+EMBED_BATCH_MAX_WAIT_MS = float(os.getenv("EMBED_BATCH_MAX_WAIT_MS", "5"))     # how long to wait for a batch to fill
+
+# Retrieval caches (LRU + TTL)
+QUERY_VECTOR_CACHE_SIZE = int(os.getenv("QUERY_VECTOR_CACHE_SIZE", "4096"))   # ~1.5 KB per entry
+QUERY_VECTOR_CACHE_TTL = float(os.getenv("QUERY_VECTOR_CACHE_TTL", "86400"))  # seconds
+SEARCH_CACHE_SIZE = int(os.getenv("SEARCH_CACHE_SIZE", "1024"))
+SEARCH_CACHE_TTL = float(os.getenv("SEARCH_CACHE_TTL", "600"))                # seconds
+
+# Semantic answer cache for /chat/ask
+ANSWER_CACHE_ENABLED = os.getenv("ANSWER_CACHE_ENABLED", "true").lower() in ("1", "true", "yes")
+ANSWER_CACHE_MAX_DISTANCE = float(os.getenv("ANSWER_CACHE_MAX_DISTANCE", "0.05"))  # cosine distance
+ANSWER_CACHE_SIZE = int(os.getenv("ANSWER_CACHE_SIZE", "512"))                     # chunk-set groups
+ANSWER_CACHE_TTL = float(os.getenv("ANSWER_CACHE_TTL", "3600"))                    # seconds
+
+# PDF extraction / OCR
+PDF_WORKERS = int(os.getenv("PDF_WORKERS", str(min(4, os.cpu_count() or 1))))  # extraction processes
+OCR_PAGE_TIMEOUT = float(os.getenv("OCR_PAGE_TIMEOUT", "60"))                    # seconds per page
+OCR_SCALE = float(os.getenv("OCR_SCALE", "2.0"))                                 # render zoom for OCR
+
+# Gemini page-range extraction (sparse / scanned pages only)
+GEMINI_PAGES_PER_REQUEST = int(os.getenv("GEMINI_PAGES_PER_REQUEST", "8"))
+GEMINI_CONCURRENCY = int(os.getenv("GEMINI_CONCURRENCY", "4"))       # ranges in flight per document
+GEMINI_RPM = float(os.getenv("GEMINI_RPM", "60"))                    # process-wide request rate limit
+GEMINI_MAX_RETRIES = int(os.getenv("GEMINI_MAX_RETRIES", "3"))
+GEMINI_BACKOFF_BASE = float(os.getenv("GEMINI_BACKOFF_BASE", "1.0"))  # seconds, doubled per retry
+
+# Extraction cache (per-page text + summary, keyed by file SHA-256)
+EXTRACTION_CACHE_PATH = os.getenv("EXTRACTION_CACHE_PATH", os.path.join("uploads", ".cache", "extractions.sqlite3"))
+EXTRACTION_CACHE_MAX_MB = float(os.getenv("EXTRACTION_CACHE_MAX_MB", "256"))
+
+# Uploads
+MAX_UPLOAD_MB = float(os.getenv("MAX_UPLOAD_MB", "100"))
+
+# Hybrid (dense + lexical) retrieval
+HYBRID_SEARCH_ENABLED = os.getenv("HYBRID_SEARCH_ENABLED", "true").lower() in ("1", "true", "yes")
+SPARSE_TOP_K = int(os.getenv("SPARSE_TOP_K", "20"))   # lexical candidates fed into fusion
+RRF_K = int(os.getenv("RRF_K", "60"))                 # reciprocal rank fusion constant
+SPARSE_MIN_SCORE = float(os.getenv("SPARSE_MIN_SCORE", "1.0"))  # BM25 (IDF-weighted) score a lexical hit needs
+
+# Cross-encoder reranking for /chat/ask (CPU, time-budgeted)
+RERANK_ENABLED = os.getenv("RERANK_ENABLED", "false").lower() in ("1", "true", "yes")
+RERANK_MODEL_NAME = os.getenv("RERANK_MODEL_NAME", "cross-encoder/ms-marco-MiniLM-L-6-v2")
+RERANK_CANDIDATES = int(os.getenv("RERANK_CANDIDATES", "30"))   # over-fetched candidates scored per query
+RERANK_TOP_N = int(os.getenv("RERANK_TOP_N", "5"))              # chunks kept for the prompt
+RERANK_BUDGET_MS = float(os.getenv("RERANK_BUDGET_MS", "300"))  # skip reranking when it would take longer
+RERANK_THREADS = int(os.getenv("RERANK_THREADS", "0"))          # torch threads for the cross-encoder, 0 = default
+
+# Prompt budgeting (estimated tokens, ~4 characters each)
+PROMPT_TOKEN_BUDGET = int(os.getenv("PROMPT_TOKEN_BUDGET", "3000"))              # whole prompt
+HISTORY_TOKEN_BUDGET = int(os.getenv("HISTORY_TOKEN_BUDGET", "500"))             # share reserved for history
+PROMPT_MIN_CONTEXT_TOKENS = int(os.getenv("PROMPT_MIN_CONTEXT_TOKENS", "1200"))   # kept for context; long questions are cut instead
+HISTORY_ANSWER_MAX_TOKENS = int(os.getenv("HISTORY_ANSWER_MAX_TOKENS", "120"))   # per past answer
+HISTORY_WINDOW_SECONDS = float(os.getenv("HISTORY_WINDOW_SECONDS", "1800"))      # older turns never go into the prompt
+
+# Qdrant collection layout (applied when a collection is created, reset or migrated)
+QDRANT_QUANTIZATION = os.getenv("QDRANT_QUANTIZATION", "none").lower()               # none | scalar | binary
+QDRANT_QUANTIZATION_RESCORE = os.getenv("QDRANT_QUANTIZATION_RESCORE", "true").lower() in ("1", "true", "yes")
+QDRANT_QUANTIZATION_OVERSAMPLING = float(os.getenv("QDRANT_QUANTIZATION_OVERSAMPLING", "2.0"))
+QDRANT_VECTORS_ON_DISK = os.getenv("QDRANT_VECTORS_ON_DISK", "false").lower() in ("1", "true", "yes")  # originals on disk, quantized in RAM
+QDRANT_HNSW_M = int(os.getenv("QDRANT_HNSW_M", "16"))
+QDRANT_HNSW_EF_CONSTRUCT = int(os.getenv("QDRANT_HNSW_EF_CONSTRUCT", "100"))
+QDRANT_SEARCH_EF = int(os.getenv("QDRANT_SEARCH_EF", "0"))                           # per-query hnsw_ef, 0 = server default
+QDRANT_REVALIDATE_SECONDS = float(os.getenv("QDRANT_REVALIDATE_SECONDS", "60"))      # re-read aliases/layout, e.g. after an out-of-process migration
+
+# Auth principal cache (decoded token -> user record)
+AUTH_CACHE_SIZE = int(os.getenv("AUTH_CACHE_SIZE", "4096"))
+AUTH_CACHE_TTL = float(os.getenv("AUTH_CACHE_TTL", "60"))   # seconds; bounds staleness across workers
+
+# Password hashing (bcrypt) pool and login throttling
+PASSWORD_HASH_WORKERS = int(os.getenv("PASSWORD_HASH_WORKERS", "2"))         # bcrypt threads
+PASSWORD_HASH_MAX_PENDING = int(os.getenv("PASSWORD_HASH_MAX_PENDING", "32"))  # queued + running before 429
+LOGIN_MAX_FAILURES = int(os.getenv("LOGIN_MAX_FAILURES", "5"))                # per email per window
+LOGIN_MAX_FAILURES_PER_IP = int(os.getenv("LOGIN_MAX_FAILURES_PER_IP", "50"))
+LOGIN_FAILURE_WINDOW = float(os.getenv("LOGIN_FAILURE_WINDOW", "300"))        # seconds
+TRUSTED_PROXY_HOPS = int(os.getenv("TRUSTED_PROXY_HOPS", "1"))                 # proxies appending to X-Forwarded-For (Render: 1), 0 = ignore it
+
+# Write-behind persistence of chat messages
+CHAT_WRITE_BATCH_SIZE = int(os.getenv("CHAT_WRITE_BATCH_SIZE", "50"))      # messages per insert_many
+CHAT_WRITE_FLUSH_MS = float(os.getenv("CHAT_WRITE_FLUSH_MS", "250"))       # max time a message waits in the buffer
+CHAT_WRITE_QUEUE_SIZE = int(os.getenv("CHAT_WRITE_QUEUE_SIZE", "1000"))
+CHAT_WRITE_FULL_POLICY = os.getenv("CHAT_WRITE_FULL_POLICY", "block").lower()  # block | drop
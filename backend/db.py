@@ -1,6 +1,8 @@
 # backend/db.py
 import os
 from motor.motor_asyncio import AsyncIOMotorClient
+from pymongo import ASCENDING, DESCENDING
+from pymongo.errors import PyMongoError
 from dotenv import load_dotenv
 import certifi
 
@@ -9,11 +11,27 @@ load_dotenv()
 MONGO_URI = os.getenv("MONGO_URI", "mongodb://localhost:27017")
 MONGO_DB = os.getenv("MONGO_DB", "chatbot_db")
 
+# Connection pool and timeouts (ms)
+MONGO_MAX_POOL_SIZE = int(os.getenv("MONGO_MAX_POOL_SIZE", "50"))
+MONGO_MIN_POOL_SIZE = int(os.getenv("MONGO_MIN_POOL_SIZE", "2"))             # kept warm for the first requests
+MONGO_MAX_IDLE_MS = int(os.getenv("MONGO_MAX_IDLE_MS", "300000"))
+MONGO_WAIT_QUEUE_TIMEOUT_MS = int(os.getenv("MONGO_WAIT_QUEUE_TIMEOUT_MS", "5000"))  # waiting for a pooled connection
+MONGO_SERVER_SELECTION_TIMEOUT_MS = int(os.getenv("MONGO_SERVER_SELECTION_TIMEOUT_MS", "5000"))
+MONGO_CONNECT_TIMEOUT_MS = int(os.getenv("MONGO_CONNECT_TIMEOUT_MS", "5000"))
+MONGO_SOCKET_TIMEOUT_MS = int(os.getenv("MONGO_SOCKET_TIMEOUT_MS", "20000"))
+
 # Explicitly enable TLS and use certifi CA bundle (fixes SSL handshake issues in slim containers)
 _client = AsyncIOMotorClient(
     MONGO_URI,
     tls=True,
     tlsCAFile=certifi.where(),
+    maxPoolSize=MONGO_MAX_POOL_SIZE,
+    minPoolSize=MONGO_MIN_POOL_SIZE,
+    maxIdleTimeMS=MONGO_MAX_IDLE_MS,
+    waitQueueTimeoutMS=MONGO_WAIT_QUEUE_TIMEOUT_MS,
+    serverSelectionTimeoutMS=MONGO_SERVER_SELECTION_TIMEOUT_MS,
+    connectTimeoutMS=MONGO_CONNECT_TIMEOUT_MS,
+    socketTimeoutMS=MONGO_SOCKET_TIMEOUT_MS,
 )
 db = _client[MONGO_DB]
 
@@ -21,3 +39,19 @@ db = _client[MONGO_DB]
 users_col = db["users"]
 chats_col = db["chats"]
 files_meta_col = db["files_meta"]   # optional; store uploaded file metadata
+
+# Index bootstrap (idempotent; run once at startup)
+_INDEXES = [
+    # History reads: newest-first per user, _id as tie-breaker
+    (chats_col, [("user_id", ASCENDING), ("created_at", DESCENDING), ("_id", DESCENDING)], {"name": "user_created"}),
+    (users_col, [("email", ASCENDING)], {"name": "email_unique", "unique": True}),
+    (files_meta_col, [("type", ASCENDING), ("source_key", ASCENDING)], {"name": "type_source_key"}),
+]
+
+async def ensure_indexes():
+    for col, keys, opts in _INDEXES:
+        try:
+            await col.create_index(keys, **opts)
+        except PyMongoError as e:
+            # e.g. duplicate emails from before the unique index: log and keep serving
+            print(f"⚠️ Could not create index {opts['name']} on {col.name}: {e}")
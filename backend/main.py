@@ -1,11 +1,25 @@
+from services.registry import warm_up, is_ready, mark_app_started, mark_first_request  # first: starts the boot clock
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import JSONResponse
 import os
+import anyio
+import asyncio
 from routes import upload, chat, reset, delete_file
-from services.embedder import load_vector_store
 from routes.auth import router as auth_router
 from routes.history import router as history_router
 from routes.chat import router as chat_router
+from routes.jobs import router as jobs_router
+from routes.metrics import router as metrics_router
+from routes.health import router as health_router
+from services.job_queue import start_workers, stop_workers
+from services.embedder import query_batcher
+from services.pdf_parser import shutdown_pool
+from services.file_handler import MAX_UPLOAD_BYTES
+from db import ensure_indexes
+from services.chat_service import chat_writer
+from services.perf_metrics import begin_request_qdrant_count, qdrant_calls_per_request
+from config import WARMUP_RETRY_BASE, WARMUP_RETRY_MAX
 
 app = FastAPI()
 
@@ -21,12 +35,95 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
-# Load vector store on startup
+# Per-request bookkeeping in one pure ASGI middleware (each BaseHTTPMiddleware layer adds
+# a task and a response relay to every request):
+# - POST /upload bodies are capped while they are received: the Content-Length check
+#   rejects honest oversized requests up front, the byte count catches chunked or lying
+#   ones before the multipart parser has spooled the whole body;
+# - Qdrant round-trips per request, by route (see /metrics), counted until the response
+#   (streams included) is finished;
+# - cold start -> first real request (health probes excluded).
+class RequestMiddleware:
+    def __init__(self, app, max_upload_body: int):
+        self.app = app
+        self.max_upload_body = max_upload_body
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        path = scope["path"]
+
+        if scope["method"] == "POST" and path == "/upload":
+            too_large = JSONResponse(status_code=413, content={"error": "File is too large."})
+            declared = dict(scope["headers"]).get(b"content-length", b"")
+            if declared.isdigit() and int(declared) > self.max_upload_body:
+                await too_large(scope, receive, send)
+                return
+
+            received = 0
+            rejected = False
+            server_receive, server_send = receive, send
+
+            async def limited_receive():
+                nonlocal received, rejected
+                if rejected:
+                    return {"type": "http.disconnect"}
+                message = await server_receive()
+                if message["type"] == "http.request":
+                    received += len(message.get("body", b""))
+                    if received > self.max_upload_body:
+                        # Answer now; the app sees a disconnect and whatever it sends is dropped
+                        rejected = True
+                        await too_large(scope, server_receive, server_send)
+                        return {"type": "http.disconnect"}
+                return message
+
+            async def guarded_send(message):
+                if not rejected:
+                    await server_send(message)
+
+            receive, send = limited_receive, guarded_send
+
+        calls = begin_request_qdrant_count()
+        await self.app(scope, receive, send)
+        route = scope.get("route")
+        if route is not None and path not in ("/health", "/ready", "/metrics"):
+            qdrant_calls_per_request.record(f"{scope['method']} {route.path}", calls[0])
+        if path not in ("/health", "/ready"):
+            mark_first_request()
+
+app.add_middleware(RequestMiddleware, max_upload_body=MAX_UPLOAD_BYTES + 64 * 1024)  # multipart overhead
+
+async def _warm_up_in_background():
+    # Retry with backoff: a failure at boot (Qdrant not up yet, model download hiccup)
+    # must not leave /ready at 503 for the life of the process.
+    delay = WARMUP_RETRY_BASE
+    while True:
+        print("🔁 Warming up embedding model and Qdrant...")
+        await anyio.to_thread.run_sync(warm_up)
+        if is_ready():
+            print("✅ Models ready.")
+            return
+        print(f"⏳ Retrying warm-up in {delay:.0f}s.")
+        await asyncio.sleep(delay)
+        delay = min(delay * 2, WARMUP_RETRY_MAX)
+
+# Serve immediately; load and warm models in the background (see /ready)
 @app.on_event("startup")
-def startup_event():
-    print("🔁 Loading vector store...")
-    load_vector_store()
-    print("✅ Vector store ready.")
+async def startup_event():
+    start_workers()
+    app.state.index_task = asyncio.create_task(ensure_indexes())
+    app.state.warmup_task = asyncio.create_task(_warm_up_in_background())
+    mark_app_started()
+
+@app.on_event("shutdown")
+async def shutdown_event():
+    app.state.warmup_task.cancel()  # may still be retrying
+    await stop_workers()
+    await chat_writer.close()  # flush buffered chat messages
+    await query_batcher.close()
+    shutdown_pool()
 
 # Routers
 app.include_router(upload.router)
@@ -35,4 +132,7 @@ app.include_router(reset.router)
 app.include_router(delete_file.router)
 app.include_router(auth_router)
 app.include_router(history_router)
-app.include_router(chat_router)
\ No newline at end of file
+app.include_router(chat_router)
+app.include_router(jobs_router)
+app.include_router(metrics_router)
+app.include_router(health_router)
\ No newline at end of file
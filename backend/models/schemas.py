@@ -16,6 +16,34 @@ class UrlIngestResponse(BaseModel):
     title: Optional[str] = None
     summary: str
 
+# Background ingestion jobs
+class JobAccepted(BaseModel):
+    job_id: str
+    status: str
+    kind: str
+    source: str
+
+class JobProgress(BaseModel):
+    pages_extracted: int = 0
+    chunks_total: int = 0
+    chunks_embedded: int = 0
+    chunks_skipped: int = 0
+    chunks_deleted: int = 0
+    summary_ready: bool = False
+    extraction_cached: bool = False
+
+class JobStatus(BaseModel):
+    job_id: str
+    kind: str
+    source: str
+    status: str
+    stage: str
+    progress: JobProgress
+    result: Optional[dict] = None
+    error: Optional[str] = None
+    created_at: datetime
+    updated_at: datetime
+
 class ChatRequest(BaseModel):
     query: str
     filter_mode: Optional[bool] = True 
@@ -1,28 +1,76 @@
 # backend/routes/auth.py
-from fastapi import APIRouter, HTTPException, Depends, Header
+from fastapi import APIRouter, HTTPException, Depends, Header, Request
 from models.schemas import UserCreate, UserLogin
-from services.user_service import create_user, authenticate_user, get_user_by_email, set_domain_filter
+from services.user_service import create_user, authenticate_user, get_principal, set_domain_filter
+from services.lru_cache import TTLLRUCache
+from services.password_hasher import PasswordPoolBusyError
+from services.login_throttle import login_throttle, login_keys
 from auth import create_access_token, decode_access_token
+from config import AUTH_CACHE_SIZE, AUTH_CACHE_TTL, TRUSTED_PROXY_HOPS
 from typing import Optional
+import time
 
 router = APIRouter(prefix="/auth", tags=["auth"])
 
+def _client_ip(request: Request) -> str:
+    # Clients can put anything in X-Forwarded-For; only the entries appended by our own
+    # proxies (the right-most TRUSTED_PROXY_HOPS) are trustworthy.
+    forwarded = request.headers.get("x-forwarded-for")
+    if forwarded and TRUSTED_PROXY_HOPS > 0:
+        hops = [h.strip() for h in forwarded.split(",") if h.strip()]
+        if len(hops) >= TRUSTED_PROXY_HOPS:
+            return hops[-TRUSTED_PROXY_HOPS]
+    return request.client.host if request.client else "unknown"
+
+def _busy(e: PasswordPoolBusyError):
+    return HTTPException(status_code=429, detail=str(e), headers={"Retry-After": "1"})
+
 @router.post("/signup")
 async def signup(payload: UserCreate):
-    user = await create_user(payload.email, payload.password, payload.username)
+    try:
+        user = await create_user(payload.email, payload.password, payload.username)
+    except PasswordPoolBusyError as e:
+        raise _busy(e)
     if not user:
         raise HTTPException(status_code=400, detail="User already exists")
     token = create_access_token({"user_id": user["id"], "email": user["email"]})
     return {"access_token": token, "token_type": "bearer", "user": {"id": user["id"], "email": user["email"], "username": user.get("username")}}
 
 @router.post("/login")
-async def login(payload: UserLogin):
-    user = await authenticate_user(payload.email, payload.password)
+async def login(payload: UserLogin, request: Request):
+    # Refuse repeated failures before spending a bcrypt verification on them
+    keys = login_keys(payload.email, _client_ip(request))
+    wait = login_throttle.retry_after(keys)
+    if wait > 0:
+        raise HTTPException(status_code=429, detail="Too many failed login attempts. Please try again later.",
+                            headers={"Retry-After": str(int(wait) + 1)})
+    try:
+        user = await authenticate_user(payload.email, payload.password)
+    except PasswordPoolBusyError as e:
+        raise _busy(e)
     if not user:
+        login_throttle.record_failure(keys)
         raise HTTPException(status_code=401, detail="Invalid credentials")
+    login_throttle.reset(keys[0][0])
     token = create_access_token({"user_id": user["id"], "email": user["email"]})
     return {"access_token": token, "token_type": "bearer", "user": {"id": user["id"], "email": user["email"], "username": user.get("username")}}
 
+# Decoded token -> user id claim; entries never outlive the token's own expiry
+token_cache = TTLLRUCache(AUTH_CACHE_SIZE, AUTH_CACHE_TTL)
+
+def _token_user_id(token: str) -> Optional[str]:
+    cached = token_cache.get(token)
+    if cached is not None:
+        user_id, exp = cached
+        if exp is None or exp > time.time():
+            return user_id
+        token_cache.pop(token)
+    payload = decode_access_token(token)
+    if not payload or not payload.get("user_id"):
+        return None
+    token_cache.set(token, (payload["user_id"], payload.get("exp")))
+    return payload["user_id"]
+
 # Dependency for routes: get current user from Authorization header: "Bearer <token>"
 async def get_current_user(authorization: Optional[str] = Header(None)):
     if not authorization:
@@ -30,10 +78,10 @@ async def get_current_user(authorization: Optional[str] = Header(None)):
     if not authorization.startswith("Bearer "):
         raise HTTPException(status_code=401, detail="Invalid auth header format")
     token = authorization.split(" ", 1)[1]
-    payload = decode_access_token(token)
-    if not payload:
+    user_id = _token_user_id(token)
+    if not user_id:
         raise HTTPException(status_code=401, detail="Invalid or expired token")
-    user = await get_user_by_email(payload.get("email"))
+    user = await get_principal(user_id)
     if not user:
         raise HTTPException(status_code=401, detail="User not found")
     return user
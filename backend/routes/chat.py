@@ -4,11 +4,16 @@ from models.schemas import ChatRequest
 from routes.auth import get_current_user
 from services.chat_service import save_chat_message, get_recent_messages
 from services.rag_pipeline import (
-    embed_query_and_search,
-    build_rag_prompt,
+    embed_query_and_search_async,
+    pack_rag_prompt,
     generate_answer_stream,
-    extractive_answer_from_chunks
+    extractive_answer_from_chunks,
+    is_follow_up,
 )
+from services.embedder import embed_query_async, current_collection_version
+from services.answer_cache import answer_cache, history_context_key
+from services.reranker import rerank
+from config import ANSWER_CACHE_ENABLED, RERANK_ENABLED, RERANK_CANDIDATES, RERANK_TOP_N, HISTORY_WINDOW_SECONDS
 import re
 
 router = APIRouter(prefix="/chat", tags=["chat"])
@@ -30,7 +35,7 @@ async def ask(payload: ChatRequest, current_user=Depends(get_current_user)):
     ]
     normalized = question.lower().strip()
     if any(re.fullmatch(p, normalized) for p in prev_q_patterns):
-        recent = await get_recent_messages(current_user["id"], limit=1)
+        recent = await get_recent_messages(current_user["id"], limit=1, with_metadata=False)
         if not recent:
             answer = "You haven't asked anything yet."
         else:
@@ -58,7 +63,12 @@ async def ask(payload: ChatRequest, current_user=Depends(get_current_user)):
         return StreamingResponse(streamer_greet(), media_type="text/event-stream")
 
     # Retrieve relevant chunks with a slightly lower threshold and higher k to improve recall
-    chunks = embed_query_and_search(question, k=8, score_threshold=0.3)
+    if RERANK_ENABLED:
+        # Over-fetch, then let the cross-encoder pick the few chunks worth putting in the prompt
+        candidates = await embed_query_and_search_async(question, k=RERANK_CANDIDATES, score_threshold=0.3)
+        chunks = await rerank(question, candidates, top_n=RERANK_TOP_N)
+    else:
+        chunks = await embed_query_and_search_async(question, k=8, score_threshold=0.3)
     if not chunks:
         answer = "I couldn't find relevant information to answer your question."
         async def streamer():
@@ -69,9 +79,39 @@ async def ask(payload: ChatRequest, current_user=Depends(get_current_user)):
             )
         return StreamingResponse(streamer(), media_type="text/event-stream")
 
+    retrieved_meta = {"retrieved": [
+        {
+            "page_content": c.get("page_content", ""),
+            "metadata": c.get("metadata", {})
+        } for c in chunks
+    ]}
+
+    # Only follow-ups get the (recent) conversation history in their prompt. Standalone
+    # questions are answered from the retrieved chunks alone, so their answers are shareable
+    # through the cache; answers built with history are keyed to that user and history.
+    recent_history = []
+    if is_follow_up(question):
+        recent_history = await get_recent_messages(
+            current_user["id"], limit=4, with_metadata=False, max_age_seconds=HISTORY_WINDOW_SECONDS,
+        )
+    context_key = history_context_key(current_user["id"], recent_history)
+
+    # --- Semantic answer cache: near-duplicate question over the same chunks ---
+    version = current_collection_version()
+    chunk_ids = [c.get("id") for c in chunks]
+    query_vector = None
+    if ANSWER_CACHE_ENABLED:
+        query_vector = await embed_query_async(question)  # served from the retrieval cache
+        cached_answer = answer_cache.lookup(query_vector, chunk_ids, version, context_key)
+        if cached_answer:
+            async def streamer_cached():
+                yield cached_answer
+                await save_chat_message(current_user["id"], question, cached_answer, {**retrieved_meta, "cached": True})
+            return StreamingResponse(streamer_cached(), media_type="text/event-stream")
+
     # Build final RAG prompt with short conversation history
-    recent_history = await get_recent_messages(current_user["id"], limit=4)
-    prompt = build_rag_prompt(chunks, question, chat_history=recent_history)
+    prompt, prompt_stats = pack_rag_prompt(chunks, question, chat_history=recent_history)
+    retrieved_meta["prompt"] = prompt_stats
 
     # Stream answer back to client
     async def streamer():
@@ -87,7 +127,8 @@ async def ask(payload: ChatRequest, current_user=Depends(get_current_user)):
                 "i'm sorry, i don't have information",
                 "i couldn't find relevant information",
                 "model not configured",
-                "error streaming response"
+                "error streaming response",
+                "error in streaming response"
             ]
             
             non_answer = (
@@ -104,17 +145,15 @@ async def ask(payload: ChatRequest, current_user=Depends(get_current_user)):
             print(f"Error in streamer: {e}")
             return
             
+        if query_vector is not None:
+            answer_cache.store(query_vector, chunk_ids, version, full_text, context_key)
+
         # Save the chat message with the full context
         await save_chat_message(
             current_user["id"], 
             question, 
             full_text,
-            {"retrieved": [
-                {
-                    "page_content": c.get("page_content", ""), 
-                    "metadata": c.get("metadata", {})
-                } for c in chunks
-            ]} if chunks else {"retrieved": []}
+            retrieved_meta
         )
         
     return StreamingResponse(streamer(), media_type="text/event-stream")
\ No newline at end of file
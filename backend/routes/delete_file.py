@@ -1,12 +1,15 @@
 from fastapi import APIRouter, HTTPException
 import os
+import anyio
+from services.embedder import delete_document_vectors
+from services.manifest_service import delete_manifest
 
 router = APIRouter()
 
 UPLOAD_FOLDER = "uploads"
 
 @router.delete("/delete/{filename}")
-def delete_file(filename: str):
+async def delete_file(filename: str):
     filepath = os.path.join(UPLOAD_FOLDER, filename)
     
     if not os.path.isfile(filepath):
@@ -14,6 +17,9 @@ def delete_file(filename: str):
     
     try:
         os.remove(filepath)
+        # Drop the document's chunks too so it stops showing up in answers
+        await anyio.to_thread.run_sync(delete_document_vectors, filename)
+        await delete_manifest(filename)
         return {"success": True, "message": f"{filename} deleted"}
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
@@ -0,0 +1,17 @@
+# backend/routes/health.py
+from fastapi import APIRouter
+from fastapi.responses import JSONResponse
+from services.registry import readiness
+
+router = APIRouter(tags=["health"])
+
+@router.get("/health")
+async def health():
+    """Liveness: the process is up and serving HTTP."""
+    return {"status": "ok"}
+
+@router.get("/ready")
+async def ready():
+    """Readiness: models are loaded and warmed up, Qdrant is reachable."""
+    state = readiness()
+    return JSONResponse(status_code=200 if state["ready"] else 503, content=state)
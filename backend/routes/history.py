@@ -1,22 +1,46 @@
 # backend/routes/history.py
 from fastapi import APIRouter, Depends, HTTPException
 from fastapi.encoders import jsonable_encoder
-from services.chat_service import get_recent_messages, clear_history
+from fastapi.responses import JSONResponse, StreamingResponse
+from services.chat_service import get_messages_page, iter_messages, clear_history
 from routes.auth import get_current_user
+from typing import Optional
+import json
 
 router = APIRouter(prefix="/history", tags=["history"])
 
 @router.get("/recent")
-async def recent(current_user = Depends(get_current_user), limit: int = 20):
+async def recent(current_user = Depends(get_current_user), limit: int = 20, cursor: Optional[str] = None):
+    """
+    Newest page of history (oldest-first within the page; at most 100 messages).
+    Pass `next_cursor` back as `cursor` to fetch the page before it.
+    """
     try:
-        msgs = await get_recent_messages(current_user["id"], limit=limit)
+        msgs, next_cursor = await get_messages_page(current_user["id"], limit=limit, cursor=cursor)
         # Ensure JSON-safe encoding for datetimes and any special types
-        return {"messages": jsonable_encoder(msgs)}
+        return {"messages": jsonable_encoder(msgs), "next_cursor": next_cursor}
+    except ValueError as e:
+        return JSONResponse(status_code=400, content={"error": str(e)})
     except Exception as e:
         import traceback
         print(f"❌ Error in /history/recent: {e}\n{traceback.format_exc()}")
         raise HTTPException(status_code=500, detail=str(e))
 
+@router.get("/export")
+async def export(current_user = Depends(get_current_user)):
+    """Full history as NDJSON (one message per line), streamed straight from the Mongo cursor."""
+    user_id = current_user["id"]
+
+    async def lines():
+        async for msg in iter_messages(user_id):
+            yield json.dumps(jsonable_encoder(msg), ensure_ascii=False) + "\n"
+
+    return StreamingResponse(
+        lines(),
+        media_type="application/x-ndjson",
+        headers={"Content-Disposition": 'attachment; filename="chat-history.ndjson"'},
+    )
+
 @router.post("/clear")
 async def clear(current_user = Depends(get_current_user)):
     deleted = await clear_history(current_user["id"])
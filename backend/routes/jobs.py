@@ -0,0 +1,26 @@
+# backend/routes/jobs.py
+from fastapi import APIRouter, Depends, HTTPException
+from models.schemas import JobStatus
+from services.job_queue import get_job
+from routes.auth import get_current_user
+
+router = APIRouter(prefix="/jobs", tags=["jobs"])
+
+@router.get("/{job_id}", response_model=JobStatus)
+async def job_status(job_id: str, current_user = Depends(get_current_user)):
+    job = get_job(job_id)
+    # Jobs are only visible to the user who submitted them
+    if not job or job["owner_id"] != current_user["id"]:
+        raise HTTPException(status_code=404, detail="Job not found")
+    return JobStatus(
+        job_id=job["id"],
+        kind=job["kind"],
+        source=job["source"],
+        status=job["status"],
+        stage=job["stage"],
+        progress=job["progress"],
+        result=job["result"],
+        error=job["error"],
+        created_at=job["created_at"],
+        updated_at=job["updated_at"],
+    )
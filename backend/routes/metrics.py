@@ -0,0 +1,38 @@
+# backend/routes/metrics.py
+from fastapi import APIRouter
+from services.embedder import query_batcher, retrieval_cache_stats
+from services.job_queue import queue_depth
+from services.answer_cache import answer_cache
+from services.registry import readiness
+from services.perf_metrics import latencies, prompt_sizes, qdrant_call_stats
+from services.qdrant_collection import collection_state
+from services.extraction_cache import extraction_cache
+from services.reranker import reranker_stats
+from services.user_service import principal_cache
+from routes.auth import token_cache
+from services.password_hasher import password_pool_stats
+from services.login_throttle import login_throttle
+from services.chat_service import chat_writer
+
+router = APIRouter(tags=["metrics"])
+
+@router.get("/metrics")
+async def metrics():
+    """In-process performance counters for tuning under load."""
+    return {
+        "query_embedding_batcher": query_batcher.stats(),
+        "latency": latencies.stats(),
+        "prompt_size": prompt_sizes.stats(),
+        "retrieval_cache": retrieval_cache_stats(),
+        "qdrant_calls": qdrant_call_stats(),
+        "qdrant_collection": collection_state(),
+        "answer_cache": answer_cache.stats(),
+        "reranker": reranker_stats(),
+        "auth_cache": {"tokens": token_cache.stats(), "principals": principal_cache.stats()},
+        "password_pool": password_pool_stats(),
+        "login_throttle": login_throttle.stats(),
+        "chat_write_behind": chat_writer.stats(),
+        "ingest_queue_depth": queue_depth(),
+        "extraction_cache": extraction_cache.stats(),
+        "startup": readiness(),
+    }
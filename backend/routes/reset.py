@@ -1,15 +1,15 @@
 from fastapi import APIRouter
-from qdrant_client.http import models as qmodels
-from services.embedder import qdrant, QDRANT_COLLECTION
-from config import EMBEDDING_DIM
+import anyio
+from services.embedder import recreate_collection, bump_collection_version
+from services.manifest_service import clear_manifests
 
 router = APIRouter()
 
 @router.post("/reset")
-def reset_vector_store():
-    # Recreate the Qdrant collection with the correct vector params
-    qdrant.recreate_collection(
-        collection_name=QDRANT_COLLECTION,
-        vectors_config=qmodels.VectorParams(size=EMBEDDING_DIM, distance=qmodels.Distance.COSINE),
-    )
+async def reset_vector_store():
+    # Recreate the Qdrant collection with the correct vector params (dense + sparse)
+    await anyio.to_thread.run_sync(recreate_collection)
+    bump_collection_version()
+    # Every stored point is gone, so manifests must not claim otherwise
+    await clear_manifests()
     return {"message": "Qdrant collection has been reset."}
@@ -1,79 +1,65 @@
 from fastapi import APIRouter, UploadFile, File
 from fastapi.responses import JSONResponse
-from models.schemas import UploadResponse, UrlIngestRequest, UrlIngestResponse
-from services.file_handler import save_uploaded_file
-from services.pdf_parser import extract_text_by_page
-from services.embedder import page_texts_to_chunks, embed_chunks_with_metadata, web_text_to_chunks
+from models.schemas import JobAccepted, UrlIngestRequest
+from services.file_handler import save_uploaded_file, UploadTooLargeError
+from services.job_queue import submit_job, check_capacity, QueueFullError
+from services.ingestion import ingest_pdf, ingest_url
 from routes.auth import get_current_user
 from fastapi import Depends
-from services.summarizer import generate_summary
-from services.web_scraper import fetch_and_extract
+import os
 
 router = APIRouter()
 
-@router.post("/upload", response_model=UploadResponse)
+def _accepted(job):
+    return JSONResponse(
+        status_code=202,
+        content=JobAccepted(job_id=job["id"], status=job["status"], kind=job["kind"], source=job["source"]).model_dump(),
+    )
+
+@router.post("/upload", response_model=JobAccepted, status_code=202)
 async def upload_file(file: UploadFile = File(...), current_user = Depends(get_current_user)):
+    """Save the PDF and queue it for extraction, summary and embedding. Poll /jobs/{job_id} for progress."""
     try:
         # 1. Validate file type
         if not file.filename.lower().endswith(".pdf"):
             return JSONResponse(status_code=400, content={"error": "Only PDF files are supported."})
 
-        # 2. Save file locally
-        file_path = save_uploaded_file(file)
-
-        # 3. Extract text by page
-        page_texts = extract_text_by_page(file_path)  # returns list of (page_number, text)
-
-        if not any(text.strip() for _, text in page_texts):
-            return JSONResponse(status_code=400, content={"error": "Uploaded PDF is empty or unreadable."})
-
-        # 4. Build full text for summary
-        full_text = " ".join(text for _, text in page_texts if text.strip())
-
-        # 5. Generate summary from all text
-        summary = generate_summary(full_text)
-
-        # 6. Convert page texts to chunk dictionaries with metadata
-        chunks_with_meta = page_texts_to_chunks(
-            page_texts=page_texts,
-            pdf_name=file.filename
-        )
-
-        # 7. Add chunks to FAISS & store metadata
-        embed_chunks_with_metadata(chunks_with_meta)
-
-        # 8. Return filename + summary
-        return {"filename": file.filename, "summary": summary}
-
+        # 2. Copy the spooled file into uploads/ (hashed on the fly, size-capped),
+        #    unless the queue is already full and it could never be indexed
+        check_capacity()
+        file_path, file_hash = await save_uploaded_file(file)
+        filename = os.path.basename(file_path)
+
+        # 3. Queue extraction -> (summary || chunk + embed)
+        try:
+            job = submit_job(
+                "pdf", current_user["id"], filename,
+                lambda job: ingest_pdf(job, file_path, filename, file_hash=file_hash),
+            )
+        except QueueFullError:
+            # Filled up while the file was being saved: don't leave an unindexed file behind
+            os.remove(file_path)
+            raise
+        return _accepted(job)
+
+    except UploadTooLargeError as e:
+        return JSONResponse(status_code=413, content={"error": str(e)})
+    except QueueFullError as e:
+        return JSONResponse(status_code=429, content={"error": str(e)}, headers={"Retry-After": "5"})
     except Exception as e:
         return JSONResponse(status_code=500, content={"error": str(e)})
 
-@router.post("/upload/url", response_model=UrlIngestResponse)
+@router.post("/upload/url", response_model=JobAccepted, status_code=202)
 async def upload_url(body: UrlIngestRequest, current_user = Depends(get_current_user)):
-    """Ingest a web page by URL, extract main text, summarize, chunk and store in Qdrant."""
+    """Queue a web page for fetching, summary, chunking and storage in Qdrant."""
     try:
         url = body.url.strip()
         if not url:
             return JSONResponse(status_code=400, content={"error": "URL is required."})
 
-        # 1) Fetch and extract readable text + title
-        extracted = await fetch_and_extract(url)
-        text = (extracted.get("text") or "").strip()
-        title = extracted.get("title")
-
-        if not text:
-            return JSONResponse(status_code=400, content={"error": "Could not extract readable content from URL."})
-
-        # 2) Summarize full text
-        summary = generate_summary(text)
-
-        # 3) Chunk like PDFs but with URL metadata
-        chunks_with_meta = web_text_to_chunks(text=text, url=url, title=title)
-
-        # 4) Embed + store
-        embed_chunks_with_metadata(chunks_with_meta)
-
-        # 5) Return response
-        return UrlIngestResponse(url=url, title=title, summary=summary)
+        job = submit_job("url", current_user["id"], url, lambda job: ingest_url(job, url))
+        return _accepted(job)
+    except QueueFullError as e:
+        return JSONResponse(status_code=429, content={"error": str(e)}, headers={"Retry-After": "5"})
     except Exception as e:
-        return JSONResponse(status_code=500, content={"error": str(e)})
\ No newline at end of file
+        return JSONResponse(status_code=500, content={"error": str(e)})
@@ -0,0 +1,112 @@
+"""
+Compare embedding backends: load time, throughput, peak RSS and parity with sentence-transformers.
+
+Usage (from backend/):
+    python scripts/bench_embedding_backends.py [sentence-transformers onnx onnx-int8] [--n 512] [--batch 32]
+
+Each backend runs in its own subprocess so RSS numbers are not polluted by the others.
+"""
+import argparse
+import json
+import os
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BACKEND_DIR)
+
+SAMPLES = [
+    "How do I reset my router to factory settings?",
+    "Error 0x80070005 when installing Windows updates",
+    "The printer shows offline even though it is connected to Wi-Fi.",
+    "Run `ipconfig /flushdns` to clear the DNS resolver cache, then restart the browser.",
+    "Hold the power button for 10 seconds until the LED blinks amber, then release.",
+    "Bluetooth headphones keep disconnecting from my laptop after sleep.",
+    "To update the firmware, download the latest image from the support portal and upload it via Settings > System.",
+    "Model XR-500 supports dual-band 2.4 GHz and 5 GHz networks with WPA3.",
+]
+
+
+def _rss_mb() -> float:
+    # ru_maxrss is KB on Linux, bytes on macOS
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return round(peak / (1024 * 1024 if sys.platform == "darwin" else 1024), 1)
+
+
+def run_worker(kind: str, n: int, batch: int, out_path: str):
+    import numpy as np
+    from config import EMBEDDING_MODEL_NAME, EMBEDDING_ONNX_DIR, EMBEDDING_THREADS
+    from services.embedding_backends import create_backend
+
+    texts = [SAMPLES[i % len(SAMPLES)] + f" #{i}" for i in range(n)]
+    t0 = time.perf_counter()
+    backend = create_backend(kind, EMBEDDING_MODEL_NAME, EMBEDDING_ONNX_DIR, EMBEDDING_THREADS)
+    load_s = time.perf_counter() - t0
+
+    backend.encode(texts[:batch], batch_size=batch)  # warm-up
+    t1 = time.perf_counter()
+    vecs = backend.encode(texts, batch_size=batch)
+    enc_s = time.perf_counter() - t1
+
+    t2 = time.perf_counter()
+    for t in texts[:64]:
+        backend.encode([t], batch_size=1)
+    single_ms = (time.perf_counter() - t2) / 64 * 1000
+
+    np.save(out_path, vecs)
+    print(json.dumps({
+        "backend": kind,
+        "load_s": round(load_s, 2),
+        "throughput_per_s": round(n / enc_s, 1),
+        "single_query_ms": round(single_ms, 2),
+        "peak_rss_mb": _rss_mb(),
+    }))
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("backends", nargs="*", default=["sentence-transformers", "onnx", "onnx-int8"])
+    ap.add_argument("--n", type=int, default=512)
+    ap.add_argument("--batch", type=int, default=32)
+    ap.add_argument("--worker", help=argparse.SUPPRESS)
+    ap.add_argument("--out", help=argparse.SUPPRESS)
+    args = ap.parse_args()
+
+    if args.worker:
+        run_worker(args.worker, args.n, args.batch, args.out)
+        return
+
+    import numpy as np
+
+    tmp = tempfile.mkdtemp(prefix="embbench-")
+    kinds = list(dict.fromkeys(["sentence-transformers"] + args.backends))  # reference always runs
+    rows, vectors = [], {}
+    for kind in kinds:
+        out = os.path.join(tmp, f"{kind}.npy")
+        proc = subprocess.run(
+            [sys.executable, __file__, "--worker", kind, "--out", out, "--n", str(args.n), "--batch", str(args.batch)],
+            cwd=BACKEND_DIR, capture_output=True, text=True,
+        )
+        if proc.returncode != 0:
+            print(f"❌ {kind} failed:\n{proc.stderr.strip()}")
+            continue
+        rows.append(json.loads(proc.stdout.strip().splitlines()[-1]))
+        vectors[kind] = np.load(out)
+
+    ref = vectors.get("sentence-transformers")
+    print(f"{'backend':<22}{'load s':>8}{'emb/s':>10}{'1-query ms':>12}{'RSS MB':>9}{'min cos':>9}{'mean cos':>10}")
+    for r in rows:
+        cos_min = cos_mean = float("nan")
+        v = vectors[r["backend"]]
+        if ref is not None and v.shape == ref.shape:
+            cos = (v * ref).sum(axis=1)  # both L2-normalized
+            cos_min, cos_mean = float(cos.min()), float(cos.mean())
+        print(f"{r['backend']:<22}{r['load_s']:>8}{r['throughput_per_s']:>10}{r['single_query_ms']:>12}"
+              f"{r['peak_rss_mb']:>9}{cos_min:>9.4f}{cos_mean:>10.4f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,48 @@
+"""
+Export the sentence-transformers MiniLM to ONNX (+ a dynamic int8 copy) for the onnx backends.
+
+Usage (from backend/):
+    python scripts/export_onnx_embedder.py models/minilm-onnx
+then set EMBEDDING_ONNX_DIR=models/minilm-onnx and EMBEDDING_BACKEND=onnx or onnx-int8.
+Needs torch + sentence-transformers at export time only.
+"""
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import torch
+from sentence_transformers import SentenceTransformer
+from onnxruntime.quantization import quantize_dynamic, QuantType
+from config import EMBEDDING_MODEL_NAME
+
+
+def main(out_dir: str):
+    os.makedirs(out_dir, exist_ok=True)
+    st = SentenceTransformer(EMBEDDING_MODEL_NAME)
+    transformer = st[0].auto_model.eval()
+    tokenizer = st.tokenizer
+    tokenizer.save_pretrained(out_dir)  # writes tokenizer.json for the fast tokenizer
+
+    sample = tokenizer(["export sample"], return_tensors="pt")
+    model_path = os.path.join(out_dir, "model.onnx")
+    torch.onnx.export(
+        transformer,
+        (sample["input_ids"], sample["attention_mask"], sample["token_type_ids"]),
+        model_path,
+        input_names=["input_ids", "attention_mask", "token_type_ids"],
+        output_names=["last_hidden_state"],
+        dynamic_axes={
+            "input_ids": {0: "batch", 1: "seq"},
+            "attention_mask": {0: "batch", 1: "seq"},
+            "token_type_ids": {0: "batch", 1: "seq"},
+            "last_hidden_state": {0: "batch", 1: "seq"},
+        },
+        opset_version=14,
+    )
+    quantize_dynamic(model_path, os.path.join(out_dir, "model.int8.onnx"), weight_type=QuantType.QInt8)
+    print(f"✅ Exported ONNX model to {out_dir}")
+
+
+if __name__ == "__main__":
+    main(sys.argv[1] if len(sys.argv) > 1 else "models/minilm-onnx")
@@ -0,0 +1,25 @@
+"""
+Rebuild the Qdrant collection under the layout currently set in the environment
+(QDRANT_QUANTIZATION, QDRANT_VECTORS_ON_DISK, QDRANT_HNSW_M, QDRANT_HNSW_EF_CONSTRUCT)
+and move the aliases to it. New writes go to the new collection as soon as it
+exists; searches keep using the old one until the backfill is done. Running app
+processes pick up the change within QDRANT_REVALIDATE_SECONDS.
+
+Usage (from backend/):
+    QDRANT_QUANTIZATION=scalar QDRANT_VECTORS_ON_DISK=true python scripts/migrate_collection.py
+"""
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from services.qdrant_collection import migrate_collection
+
+
+def main():
+    result = migrate_collection()
+    print(f"✅ Migrated {result['copied']} points ({result['pruned']} deleted meanwhile): {result['source']} -> {result['target']}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,79 @@
+import hashlib
+from typing import Any, Dict, List, Optional, Sequence
+
+import numpy as np
+
+from config import ANSWER_CACHE_SIZE, ANSWER_CACHE_TTL, ANSWER_CACHE_MAX_DISTANCE
+from services.lru_cache import TTLLRUCache
+
+
+class SemanticAnswerCache:
+    """
+    Reuses a generated answer when a new question is a near-duplicate of one already answered.
+
+    Entries are grouped by (collection version, retrieved chunk ids, context key), so a hit requires
+    the exact same supporting context from the same collection state; within a group the stored
+    question vectors are compared by cosine distance. Groups live in a bounded LRU/TTL cache.
+
+    `context_key` covers whatever else went into the prompt (the asking user's history):
+    answers generated with history are only reused for that same user and history.
+    """
+
+    def __init__(self, max_entries: int, ttl_seconds: float, max_distance: float, per_group: int = 8):
+        self._groups = TTLLRUCache(max_entries, ttl_seconds)
+        self.max_distance = max_distance
+        self.per_group = per_group
+        self.hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def _key(chunk_ids: Sequence[str], version: int, context_key: str):
+        return (version, tuple(sorted(str(i) for i in chunk_ids)), context_key)
+
+    @staticmethod
+    def _unit(vector) -> np.ndarray:
+        v = np.asarray(vector, dtype=np.float32)
+        n = float(np.linalg.norm(v))
+        return v / n if n else v
+
+    def lookup(self, query_vector, chunk_ids: Sequence[str], version: int, context_key: str = "") -> Optional[str]:
+        group: Optional[List[Dict[str, Any]]] = self._groups.get(self._key(chunk_ids, version, context_key))
+        if group:
+            q = self._unit(query_vector)
+            best = max(group, key=lambda e: float(np.dot(q, e["vector"])))
+            if 1.0 - float(np.dot(q, best["vector"])) <= self.max_distance:
+                self.hits += 1
+                return best["answer"]
+        self.misses += 1
+        return None
+
+    def store(self, query_vector, chunk_ids: Sequence[str], version: int, answer: str, context_key: str = ""):
+        key = self._key(chunk_ids, version, context_key)
+        group = self._groups.get(key) or []
+        group.append({"vector": self._unit(query_vector), "answer": answer})
+        # Re-set so the group's TTL/LRU position is refreshed
+        self._groups.set(key, group[-self.per_group:])
+
+    def stats(self) -> Dict[str, Any]:
+        total = self.hits + self.misses
+        return {
+            "groups": len(self._groups),
+            "max_distance": self.max_distance,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / total, 4) if total else 0.0,
+        }
+
+
+def history_context_key(user_id: str, history: Optional[List[Dict[str, Any]]]) -> str:
+    """Empty without history (answers shareable across users), else a per-user digest of the turns."""
+    if not history:
+        return ""
+    h = hashlib.blake2b(str(user_id).encode("utf-8"), digest_size=16)
+    for turn in history:
+        h.update(b"\x00" + str(turn.get("question") or turn.get("query") or "").encode("utf-8"))
+        h.update(b"\x00" + str(turn.get("answer") or "").encode("utf-8"))
+    return h.hexdigest()
+
+
+answer_cache = SemanticAnswerCache(ANSWER_CACHE_SIZE, ANSWER_CACHE_TTL, ANSWER_CACHE_MAX_DISTANCE)
@@ -0,0 +1,53 @@
+import asyncio
+import threading
+from typing import AsyncIterator, Callable, Iterable, TypeVar
+
+T = TypeVar("T")
+
+_DONE = object()
+
+
+async def iterate_in_thread(make_iter: Callable[[], Iterable[T]], max_buffer: int = 64) -> AsyncIterator[T]:
+    """
+    Drive a blocking iterator on a worker thread and yield its items on the event loop.
+
+    `make_iter` is called on the worker thread too, so the blocking request that
+    opens the stream never runs on the loop. If the consumer stops early, the
+    worker stops pulling items at the next boundary.
+    """
+    loop = asyncio.get_running_loop()
+    queue: asyncio.Queue = asyncio.Queue(maxsize=max_buffer)
+    stop = threading.Event()
+
+    def put(item):
+        # Blocks the worker (not the loop) when the consumer falls behind
+        asyncio.run_coroutine_threadsafe(queue.put(item), loop).result()
+
+    def worker():
+        try:
+            for item in make_iter():
+                if stop.is_set():
+                    return
+                put(item)
+        except BaseException as e:  # surfaced to the consumer
+            if not stop.is_set():
+                put(e)
+            return
+        if not stop.is_set():
+            put(_DONE)
+
+    thread = threading.Thread(target=worker, name="iterate-in-thread", daemon=True)
+    thread.start()
+    try:
+        while True:
+            item = await queue.get()
+            if item is _DONE:
+                return
+            if isinstance(item, BaseException):
+                raise item
+            yield item
+    finally:
+        stop.set()
+        # Unblock a worker waiting on a full queue
+        while not queue.empty():
+            queue.get_nowait()
@@ -1,37 +1,106 @@
 # backend/services/chat_service.py
 from db import chats_col
 from bson import ObjectId
+from config import CHAT_WRITE_BATCH_SIZE, CHAT_WRITE_FLUSH_MS, CHAT_WRITE_QUEUE_SIZE, CHAT_WRITE_FULL_POLICY
+from services.write_behind import WriteBehindBuffer
+from typing import Optional, Tuple
+import base64
 import datetime
-from fastapi.encoders import jsonable_encoder
+
+# What history reads fetch: retrieval context and prompt stats stay in the database
+_HISTORY_PROJECTION = {"metadata.retrieved": 0, "metadata.prompt": 0}
+# Prompt building only needs the exchange itself
+_EXCHANGE_PROJECTION = {"query": 1, "answer": 1, "created_at": 1}
+# Newest first; _id breaks ties between messages saved in the same millisecond
+_NEWEST_FIRST = [("created_at", -1), ("_id", -1)]
+MAX_PAGE_SIZE = 100
+
+def _to_message(d: dict, user_id: str) -> dict:
+    # Normalize fields for frontend HistoryMessage type (JSON encoding happens in the route)
+    return {
+        "id": str(d.get("_id")) if d.get("_id") is not None else None,
+        "user_id": user_id,
+        "question": d.get("query"),
+        "answer": d.get("answer"),
+        "metadata": d.get("metadata", {}),
+        "timestamp": d.get("created_at")
+    }
+
+def encode_cursor(d: dict) -> str:
+    """Opaque keyset cursor: position just after document `d` in newest-first order."""
+    raw = f"{d['created_at'].isoformat()}|{d['_id']}"
+    return base64.urlsafe_b64encode(raw.encode("utf-8")).decode("ascii")
+
+def decode_cursor(cursor: str) -> Tuple[datetime.datetime, ObjectId]:
+    """Raises ValueError for malformed cursors."""
+    try:
+        ts, oid = base64.urlsafe_b64decode(cursor.encode("ascii")).decode("utf-8").split("|", 1)
+        return datetime.datetime.fromisoformat(ts), ObjectId(oid)
+    except Exception as e:
+        raise ValueError("Invalid cursor") from e
+
+# Chat messages are written behind the response: queued here, flushed with insert_many
+chat_writer = WriteBehindBuffer(
+    chats_col,
+    max_batch=CHAT_WRITE_BATCH_SIZE,
+    flush_ms=CHAT_WRITE_FLUSH_MS,
+    max_queue=CHAT_WRITE_QUEUE_SIZE,
+    policy=CHAT_WRITE_FULL_POLICY,
+)
 
 async def save_chat_message(user_id: str, query: str, answer: str, metadata: dict | None = None):
+    """Queue the message for a batched write; returns its (preassigned) id."""
     doc = {
+        "_id": ObjectId(),
         "user_id": user_id,
         "query": query,
         "answer": answer,
         "metadata": metadata or {},
         "created_at": datetime.datetime.utcnow()
     }
-    res = await chats_col.insert_one(doc)
-    return res.inserted_id
+    await chat_writer.add(doc)
+    return doc["_id"]
 
-async def get_recent_messages(user_id: str, limit: int = 20):
-    cursor = chats_col.find({"user_id": user_id}).sort("created_at", -1).limit(limit)
-    msgs = []
-    async for d in cursor:
-        # Normalize fields for frontend HistoryMessage type
-        safe_meta = jsonable_encoder(d.get("metadata", {}))
-        msgs.append({
-            "id": str(d.get("_id")) if d.get("_id") is not None else None,
-            "user_id": d.get("user_id"),
-            "question": d.get("query"),
-            "answer": d.get("answer"),
-            "metadata": safe_meta,
-            "timestamp": d.get("created_at")
-        })
+async def get_recent_messages(user_id: str, limit: int = 20, with_metadata: bool = True,
+                              max_age_seconds: Optional[float] = None):
+    """
+    Last `limit` messages, oldest first. `with_metadata=False` fetches only question/answer/time;
+    `max_age_seconds` leaves out older messages.
+    """
+    projection = _HISTORY_PROJECTION if with_metadata else _EXCHANGE_PROJECTION
+    query = {"user_id": user_id}
+    if max_age_seconds is not None:
+        query["created_at"] = {"$gte": datetime.datetime.utcnow() - datetime.timedelta(seconds=max_age_seconds)}
+    cursor = chats_col.find(query, projection).sort(_NEWEST_FIRST).limit(limit)
+    msgs = [_to_message(d, user_id) async for d in cursor]
     # newest-first -> return oldest-first
     return list(reversed(msgs))
 
+async def get_messages_page(user_id: str, limit: int = 20, cursor: Optional[str] = None):
+    """
+    Keyset page of history walking backwards in time: the `limit` messages older than
+    `cursor` (or the newest ones), returned oldest-first, plus the cursor for the next
+    older page (None at the end). Served by the (user_id, created_at, _id) index.
+    """
+    limit = max(1, min(limit, MAX_PAGE_SIZE))
+    query = {"user_id": user_id}
+    if cursor:
+        ts, oid = decode_cursor(cursor)
+        query["$or"] = [{"created_at": {"$lt": ts}}, {"created_at": ts, "_id": {"$lt": oid}}]
+    # One extra document tells whether an older page exists
+    docs = await chats_col.find(query, _HISTORY_PROJECTION).sort(_NEWEST_FIRST).limit(limit + 1).to_list(length=limit + 1)
+    next_cursor = encode_cursor(docs[limit - 1]) if len(docs) > limit else None
+    msgs = [_to_message(d, user_id) for d in docs[:limit]]
+    return list(reversed(msgs)), next_cursor
+
+async def iter_messages(user_id: str, batch_size: int = 200):
+    """Every message oldest-first, full documents, as the Motor cursor delivers them."""
+    cursor = chats_col.find({"user_id": user_id}).sort([("created_at", 1), ("_id", 1)]).batch_size(batch_size)
+    async for d in cursor:
+        yield _to_message(d, user_id)
+
 async def clear_history(user_id: str):
+    # Buffered messages would otherwise land after the delete
+    await chat_writer.flush()
     res = await chats_col.delete_many({"user_id": user_id})
     return res.deleted_count
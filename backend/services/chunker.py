@@ -1,20 +1,183 @@
-from config import CHUNK_SIZE, CHUNK_OVERLAP
+import re
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Optional, Sequence, Tuple
 
-def chunk_text(text):
+from config import CHUNK_MAX_TOKENS, CHUNK_OVERLAP_TOKENS
+
+TokenCounter = Callable[[Sequence[str]], List[int]]
+
+# Sentence ends at . ! ? (optionally followed by quotes/brackets) before whitespace
+_SENTENCE_SPLIT = re.compile(r"(?<=[.!?])\s+|(?<=[.!?][\"')\]])\s+")
+_BULLET = re.compile(r"^\s*(?:[-*•▪●]|\d+[.)])\s+")
+_NUMBERED_HEADING = re.compile(r"^\s*(?:\d+(?:\.\d+)*\.?|[A-Z][.)]|chapter\s+\d+|section\s+\d+)\s+\S", re.IGNORECASE)
+
+
+def _default_counter(max_tokens: int) -> Tuple[TokenCounter, int]:
     """
-    Splits input text into chunks of CHUNK_SIZE words with CHUNK_OVERLAP.
-    
-    Returns:
-        List of text chunks.
+    The embedding model's own tokenizer, so chunk sizes match what the model actually sees,
+    and max_tokens clamped to its window ([CLS]/[SEP] take two positions) so a larger
+    CHUNK_MAX_TOKENS cannot produce chunks the model silently truncates.
+    """
+    from services.registry import get_embedding_model
+    model = get_embedding_model()
+    return model.count_tokens, min(max_tokens, model.max_seq_length - 2)
+
+
+def _is_heading(line: str) -> bool:
+    s = line.strip()
+    if not s or len(s) > 80 or s[-1] in ".,;:!?":
+        return False
+    if s.startswith("#"):
+        return True
+    words = s.split()
+    if len(words) > 10 or not any(w[0].isalpha() for w in words):
+        return False  # long lines, and number/symbol-only lines such as table rows
+    if s.isupper() and any(ch.isalpha() for ch in s):
+        return True
+    if _NUMBERED_HEADING.match(s) and not _BULLET.match(s):
+        return True
+    return all(w[0].isupper() for w in words if w[0].isalpha())
+
+
+def _sentences(lines: List[str]) -> Iterator[str]:
+    for sent in _SENTENCE_SPLIT.split(" ".join(lines)):
+        if sent.strip():
+            yield sent.strip()
+
+
+def _units(text: str) -> Iterator[Tuple[str, bool]]:
+    """
+    Yield (unit, is_heading): sentences, plus heading lines that should open a new chunk.
+    PDF text breaks at every visual line, so a heading-like line (e.g. a Title-Case UI label)
+    only counts as one where a new line of thought can start: at the top of a block, after
+    another heading, or after a line ending in sentence punctuation. Elsewhere it is wrapped
+    sentence text.
+    """
+    for block in re.split(r"\n\s*\n", text):
+        lines = [ln.strip() for ln in block.splitlines() if ln.strip()]
+        buf: List[str] = []
+        at_boundary = True
+        for ln in lines:
+            if at_boundary and _is_heading(ln):
+                yield from ((sent, False) for sent in _sentences(buf))
+                buf = []
+                yield ln, True
+            else:
+                buf.append(ln)
+                at_boundary = ln[-1] in ".!?:"
+        yield from ((sent, False) for sent in _sentences(buf))
+
+
+def _split_long(sentence: str, max_tokens: int, count: TokenCounter) -> List[Tuple[str, int]]:
+    """Split a single over-long sentence on word boundaries into pieces that fit max_tokens."""
+    words = sentence.split()
+    lengths = count(words)
+    pieces: List[Tuple[str, int]] = []
+    start, used = 0, 0
+    for i, n in enumerate(lengths):
+        if used + n > max_tokens and i > start:
+            pieces.append((" ".join(words[start:i]), used))
+            start, used = i, 0
+        used += n
+    if start < len(words):
+        pieces.append((" ".join(words[start:]), used))
+    return pieces
+
+
+def chunk_segment(
+    text: str,
+    max_tokens: int = CHUNK_MAX_TOKENS,
+    overlap_tokens: int = CHUNK_OVERLAP_TOKENS,
+    count_tokens: Optional[TokenCounter] = None,
+) -> Iterator[str]:
+    """
+    Single pass over one segment (a page or a web document): pack whole sentences into
+    chunks of at most `max_tokens` tokenizer tokens, start a new chunk at headings,
+    and carry up to `overlap_tokens` of trailing sentences into the next chunk.
+    """
+    if count_tokens is None:
+        count_tokens, max_tokens = _default_counter(max_tokens)
+    count = count_tokens
+    units = list(_units(text or ""))
+    if not units:
+        return
+    lengths = count([u for u, _ in units])  # one tokenizer call per segment
+
+    current: List[Tuple[str, int]] = []
+    used = 0
+    fresh = 0    # sentences added since the last emitted chunk (headings and overlap alone are not a chunk)
+    pending = 0  # units of any kind added since the last emitted chunk
+    emitted = False
+    heading_run = False  # last chunk was cut from a run of headings (a TOC) that may continue
+
+    def emit():
+        return " ".join(t for t, _ in current)
+
+    def carry_overlap():
+        kept: List[Tuple[str, int]] = []
+        total = 0
+        for t, n in reversed(current):
+            if total + n > overlap_tokens:
+                break
+            kept.insert(0, (t, n))
+            total += n
+        return kept, total
+
+    for (unit, is_heading), n in zip(units, lengths):
+        pieces = [(unit, n)] if n <= max_tokens else _split_long(unit, max_tokens, count)
+        for j, (piece, pn) in enumerate(pieces):
+            if is_heading and j == 0:
+                # Headings open a new chunk; no overlap across sections. Consecutive
+                # headings (a TOC, nested titles) stay together with the text that follows,
+                # up to max_tokens.
+                if fresh or (pending and used + pn > max_tokens):
+                    yield emit()
+                    emitted = True
+                    heading_run = not fresh
+                    current, used, fresh, pending = [], 0, 0, 0
+                elif not pending:
+                    current, used = [], 0
+            elif used + pn > max_tokens and pending:
+                yield emit()
+                emitted = True
+                heading_run = False
+                current, used = carry_overlap()
+                fresh = pending = 0
+                while current and used + pn > max_tokens:
+                    used -= current.pop(0)[1]
+            current.append((piece, pn))
+            used += pn
+            pending += 1
+            if not is_heading:
+                fresh += 1
+    # Heading-only leftovers are kept when the segment has nothing else or they finish a TOC
+    if fresh or (pending and (not emitted or heading_run)):
+        yield emit()
+
+
+def iter_chunks(
+    segments: Iterable[Tuple[str, Dict[str, Any]]],
+    max_tokens: int = CHUNK_MAX_TOKENS,
+    overlap_tokens: int = CHUNK_OVERLAP_TOKENS,
+    count_tokens: Optional[TokenCounter] = None,
+) -> Iterator[Dict[str, Any]]:
+    """
+    Shared chunking engine for PDFs, web pages and plain text.
+    segments: (text, metadata) pairs; each chunk gets a copy of its segment's metadata.
+    Yields {"text": ..., "metadata": {...}}.
     """
-    words = text.split()
-    chunks = []
+    if count_tokens is None:
+        count_tokens, max_tokens = _default_counter(max_tokens)
+    count = count_tokens
+    for text, meta in segments:
+        for chunk in chunk_segment(text, max_tokens, overlap_tokens, count):
+            yield {"text": chunk, "metadata": dict(meta)}
 
-    for i in range(0, len(words), CHUNK_SIZE - CHUNK_OVERLAP):
-        chunk = words[i:i + CHUNK_SIZE]
-        chunks.append(" ".join(chunk))
 
-        if i + CHUNK_SIZE >= len(words):
-            break
+def chunk_text(text, count_tokens: Optional[TokenCounter] = None):
+    """
+    Splits input text into chunks of at most CHUNK_MAX_TOKENS tokens with CHUNK_OVERLAP_TOKENS overlap.
 
-    return chunks
+    Returns:
+        List of text chunks.
+    """
+    return list(chunk_segment(text, count_tokens=count_tokens))
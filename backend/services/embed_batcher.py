@@ -0,0 +1,112 @@
+import asyncio
+from concurrent.futures import Executor
+from typing import Any, Callable, Dict, List, Optional, Sequence
+
+
+class EmbeddingBatcher:
+    """
+    Collects concurrent query-embedding requests for up to `max_wait_ms`
+    (or until `max_batch` are waiting) and encodes them in one model call.
+    Each caller awaits its own future.
+    """
+
+    def __init__(
+        self,
+        encode_fn: Callable[[Sequence[str]], List[List[float]]],
+        executor: Executor,
+        max_batch: int = 32,
+        max_wait_ms: float = 5.0,
+        max_inflight: int = 1,
+    ):
+        self._encode_fn = encode_fn
+        self._executor = executor
+        self.max_batch = max(1, max_batch)
+        self.max_wait = max(0.0, max_wait_ms) / 1000.0
+        self._max_inflight = max(1, max_inflight)
+        self._queue: Optional[asyncio.Queue] = None
+        self._task: Optional[asyncio.Task] = None
+        self._inflight: Optional[asyncio.Semaphore] = None
+
+        # Metrics
+        self._batch_hist: Dict[int, int] = {}   # power-of-two bucket -> batch count
+        self._batches = 0
+        self._items = 0
+        self._errors = 0
+
+    # -------------------------
+    # Public API
+    # -------------------------
+    async def embed(self, text: str) -> List[float]:
+        self._ensure_running()
+        fut = asyncio.get_running_loop().create_future()
+        await self._queue.put((text, fut))
+        return await fut
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "queue_depth": self._queue.qsize() if self._queue is not None else 0,
+            "batches": self._batches,
+            "items": self._items,
+            "errors": self._errors,
+            "avg_batch_size": round(self._items / self._batches, 2) if self._batches else 0.0,
+            "batch_size_histogram": {f"<={b}": n for b, n in sorted(self._batch_hist.items())},
+            "max_batch": self.max_batch,
+            "max_wait_ms": self.max_wait * 1000.0,
+        }
+
+    async def close(self):
+        if self._task is not None:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+
+    # -------------------------
+    # Internals
+    # -------------------------
+    def _ensure_running(self):
+        if self._task is None or self._task.done():
+            self._queue = asyncio.Queue()
+            self._inflight = asyncio.Semaphore(self._max_inflight)
+            self._task = asyncio.create_task(self._collect_loop())
+
+    async def _collect_loop(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            batch = [await self._queue.get()]
+            deadline = loop.time() + self.max_wait
+            while len(batch) < self.max_batch:
+                remaining = deadline - loop.time()
+                if remaining <= 0:
+                    break
+                try:
+                    batch.append(await asyncio.wait_for(self._queue.get(), remaining))
+                except asyncio.TimeoutError:
+                    break
+            # Don't start collecting the next batch until a model slot is free
+            await self._inflight.acquire()
+            asyncio.create_task(self._dispatch(batch))
+
+    async def _dispatch(self, batch):
+        try:
+            texts = [t for t, _ in batch]
+            self._record(len(texts))
+            loop = asyncio.get_running_loop()
+            vectors = await loop.run_in_executor(self._executor, self._encode_fn, texts)
+            for (_, fut), vec in zip(batch, vectors):
+                if not fut.done():
+                    fut.set_result(vec)
+        except Exception as e:
+            self._errors += 1
+            for _, fut in batch:
+                if not fut.done():
+                    fut.set_exception(e)
+        finally:
+            self._inflight.release()
+
+    def _record(self, size: int):
+        bucket = 1
+        while bucket < size:
+            bucket *= 2
+        self._batch_hist[bucket] = self._batch_hist.get(bucket, 0) + 1
+        self._batches += 1
+        self._items += size
@@ -1,133 +1,267 @@
 
-import os
 import re
+import json
 import uuid
-from typing import List, Dict, Any, Optional
+import time
+import asyncio
+import hashlib
+import contextvars
+from collections import deque
+from concurrent.futures import Future, ThreadPoolExecutor
+from itertools import islice
+from typing import List, Dict, Any, Optional, Callable, Deque, Iterable, Iterator, Tuple
 
 import numpy as np
-from sentence_transformers import SentenceTransformer
-from qdrant_client import QdrantClient
 from qdrant_client.http import models as qmodels
-from config import EMBEDDING_DIM
+from config import (
+    QUERY_ENCODE_WORKERS, EMBED_BATCH_MAX_SIZE, EMBED_BATCH_MAX_WAIT_MS,
+    QUERY_VECTOR_CACHE_SIZE, QUERY_VECTOR_CACHE_TTL, SEARCH_CACHE_SIZE, SEARCH_CACHE_TTL,
+    INGEST_EMBED_BATCH, UPSERT_PARALLELISM, CHUNK_MAX_TOKENS, CHUNK_OVERLAP_TOKENS,
+    HYBRID_SEARCH_ENABLED, SPARSE_TOP_K, SPARSE_MIN_SCORE, RRF_K,
+)
+from services.embed_batcher import EmbeddingBatcher
+from services.chunker import iter_chunks
+from services.lru_cache import TTLLRUCache
+from services.perf_metrics import latencies
+from services import sparse_encoder
+from services.registry import get_embedding_model, get_qdrant, get_async_qdrant
+from services.qdrant_collection import (
+    QDRANT_COLLECTION, WRITE_COLLECTION, SPARSE_VECTOR_NAME,
+    ensure_collection, recreate_collection, hybrid_available, write_sparse_available, dense_search_params,
+    collection_ready, revalidate_on_error,
+)
 
 # =========================
-# Load embedding model
+# Qdrant configuration
 # =========================
-embedding_model = SentenceTransformer("all-MiniLM-L6-v2")
+# The embedding model and Qdrant clients (sync for ingestion/admin, async for the
+# chat retrieval path) are created lazily by services.registry.
+# QDRANT_COLLECTION (reads) and WRITE_COLLECTION (upserts) are aliases over a versioned
+# physical collection; they only differ while a migration is running (see qdrant_collection).
+
+# Dedicated pool for query encoding so model forward passes never run on the event loop
+# and don't compete with the default thread pool used for ingestion/IO.
+_query_executor = ThreadPoolExecutor(max_workers=QUERY_ENCODE_WORKERS, thread_name_prefix="query-encode")
 
 # =========================
-# Qdrant configuration
+# Retrieval caches
 # =========================
-QDRANT_URL = os.getenv("QDRANT_URL")  
-QDRANT_API_KEY = os.getenv("QDRANT_API_KEY")
-QDRANT_COLLECTION = os.getenv("QDRANT_COLLECTION", "techsupport_chunks")
-
-# Init client
-if QDRANT_URL:
-    qdrant = QdrantClient(url=QDRANT_URL, api_key=QDRANT_API_KEY)
-else:
-    qdrant = QdrantClient(
-        host=os.getenv("QDRANT_HOST", "127.0.0.1"), 
-        port=int(os.getenv("QDRANT_PORT", "6333"))
-    )
+# Level 1: normalized query text -> vector. Level 2: (vector, k, threshold, collection version) -> hits.
+# The version is bumped on every change to the collection (upsert, reset, delete) so level 2
+# never serves stale hits. It is per-process; the TTL bounds staleness across workers.
+query_vector_cache = TTLLRUCache(QUERY_VECTOR_CACHE_SIZE, QUERY_VECTOR_CACHE_TTL)
+search_results_cache = TTLLRUCache(SEARCH_CACHE_SIZE, SEARCH_CACHE_TTL)
+collection_version = 0
+
+def bump_collection_version():
+    global collection_version
+    collection_version += 1
+    search_results_cache.clear()
+
+def current_collection_version() -> int:
+    return collection_version
+
+def _normalize_query(query: str) -> str:
+    # MiniLM is uncased, so case and whitespace don't change the embedding
+    return " ".join(query.lower().split())
+
+def _search_key(query_vector, k: int, score_threshold: float, lexical_key: str = ""):
+    digest = hashlib.blake2b(np.asarray(query_vector, dtype=np.float32).tobytes(), digest_size=16).hexdigest()
+    return (digest, k, round(score_threshold, 4), collection_version, lexical_key)
+
+def _copy_results(results: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    return [dict(r) for r in results]
+
+def retrieval_cache_stats() -> Dict[str, Any]:
+    return {
+        "collection_version": collection_version,
+        "query_vectors": query_vector_cache.stats(),
+        "search_results": search_results_cache.stats(),
+    }
 
 # =========================
 # Ensure Collection Exists
 # =========================
-def ensure_collection():
-    assert qdrant is not None, "Qdrant client not initialized."
-    existing = {c.name for c in qdrant.get_collections().collections}
-    if QDRANT_COLLECTION not in existing:
-        qdrant.recreate_collection(
-            collection_name=QDRANT_COLLECTION,
-            vectors_config=qmodels.VectorParams(size=EMBEDDING_DIM, distance=qmodels.Distance.COSINE),
-        )
-    try:
-        qdrant.create_payload_index(
-            collection_name=QDRANT_COLLECTION,
-            field_name="metadata.domain",
-            field_schema=qmodels.PayloadSchemaType.KEYWORD,
-        )
-    except Exception:
-        pass  # already exists
+# Collection layout, aliasing and migration live in services.qdrant_collection.
 
 
 # =========================
-# Chunk PDF pages
+# Chunk PDF pages / web pages
 # =========================
-def page_texts_to_chunks(page_texts, pdf_name, domain="techsupport", chunk_size=200, overlap=50, source_type="pdf"):
+# Both go through the shared token-aware engine in services.chunker.
+def page_texts_to_chunks(page_texts, pdf_name, domain="techsupport", max_tokens=CHUNK_MAX_TOKENS, overlap_tokens=CHUNK_OVERLAP_TOKENS, source_type="pdf"):
     """
     Convert [(page_number, text), ...] → chunks with metadata.
     Supports tagging OCR vs normal PDF text via `source_type`.
     """
-    results = []
-    for page_num, text in page_texts:
-        words = text.split()
-        for i in range(0, len(words), chunk_size - overlap):
-            chunk_words = words[i:i + chunk_size]
-            if not chunk_words:
-                continue
-            chunk_text = " ".join(chunk_words)
-            results.append({
-                "text": chunk_text,
-                "metadata": {
-                    "pdf_name": pdf_name,
-                    "page_number": page_num,
-                    "domain": domain,
-                    "source_type": source_type  # tag as "pdf" or "ocr"
-                }
-            })
-    return results
+    segments = (
+        (text, {
+            "pdf_name": pdf_name,
+            "page_number": page_num,
+            "domain": domain,
+            "source_type": source_type  # tag as "pdf" or "ocr"
+        })
+        for page_num, text in page_texts
+    )
+    return list(iter_chunks(segments, max_tokens, overlap_tokens))
 
-def web_text_to_chunks(text: str, url: str, title: Optional[str] = None, domain: str = "techsupport", chunk_size: int = 200, overlap: int = 50):
+def web_text_to_chunks(text: str, url: str, title: Optional[str] = None, domain: str = "techsupport", max_tokens: int = CHUNK_MAX_TOKENS, overlap_tokens: int = CHUNK_OVERLAP_TOKENS):
     """Convert raw web page text → chunks with URL metadata.
     Metadata fields mirror PDF flow for consistency.
     """
-    words = (text or "").split()
     results: List[Dict[str, Any]] = []
-    page_counter = 1
-    for i in range(0, len(words), chunk_size - overlap):
-        chunk_words = words[i:i + chunk_size]
-        if not chunk_words:
-            continue
-        chunk_text = " ".join(chunk_words)
-        results.append({
-            "text": chunk_text,
-            "metadata": {
-                "source": url,
-                "title": title or None,
-                "page_number": page_counter,  # pseudo pages for consistent UI
-                "domain": domain,
-                "source_type": "url"
-            }
-        })
-        page_counter += 1
+    meta = {"source": url, "title": title or None, "domain": domain, "source_type": "url"}
+    for page_counter, chunk in enumerate(iter_chunks([(text or "", meta)], max_tokens, overlap_tokens), start=1):
+        chunk["metadata"]["page_number"] = page_counter  # pseudo pages for consistent UI
+        results.append(chunk)
     return results
 
 
 # =========================
 # Embed Chunks + Store
 # =========================
-def embed_chunks_with_metadata(chunks_with_meta: List[Dict[str, Any]]):
+def _iter_batches(items: Iterable[Dict[str, Any]], size: int) -> Iterator[List[Dict[str, Any]]]:
+    it = iter(items)
+    while True:
+        batch = list(islice(it, size))
+        if not batch:
+            return
+        yield batch
+
+
+# =========================
+# Deterministic point ids
+# =========================
+_POINT_NAMESPACE = uuid.UUID("5f0c8f0e-3a57-4b8e-9d0e-7d0b6a6c2f11")
+
+def source_key(metadata: Dict[str, Any]) -> str:
+    """Identity of the document a chunk came from (PDF filename or URL)."""
+    return metadata.get("pdf_name") or metadata.get("source") or ""
+
+def chunk_point_id(chunk: Dict[str, Any]) -> str:
+    """Same source + same chunk text -> same point id, so re-ingesting overwrites instead of duplicating."""
+    content_hash = hashlib.sha256((chunk.get("text") or "").encode("utf-8")).hexdigest()
+    return str(uuid.uuid5(_POINT_NAMESPACE, f"{source_key(chunk.get('metadata') or {})}\n{content_hash}"))
+
+def chunk_fingerprint(chunk: Dict[str, Any]) -> str:
+    """Changes when either the text or the payload metadata of a chunk changes."""
+    body = json.dumps({"text": chunk.get("text", ""), "metadata": chunk.get("metadata", {})}, sort_keys=True, default=str)
+    return hashlib.sha256(body.encode("utf-8")).hexdigest()
+
+
+def _upsert_batch(batch: List[Dict[str, Any]], vectors: np.ndarray, wait: bool):
+    # float32 until here; converted once per batch for the wire format
+    dense = vectors.tolist()
+    if HYBRID_SEARCH_ENABLED and write_sparse_available():
+        sparse = []
+        for item in batch:
+            indices, values = sparse_encoder.encode_document(item.get("text", ""))
+            sparse.append(qmodels.SparseVector(indices=indices, values=values))
+        batch_vectors = {"": dense, SPARSE_VECTOR_NAME: sparse}
+    else:
+        batch_vectors = dense
+    get_qdrant().upsert(
+        collection_name=WRITE_COLLECTION,
+        points=qmodels.Batch(
+            ids=[chunk_point_id(item) for item in batch],
+            vectors=batch_vectors,
+            payloads=[{"text": item.get("text", ""), "metadata": item.get("metadata", {})} for item in batch],
+        ),
+        wait=wait,
+    )
+
+
+def embed_chunks_with_metadata(
+    chunks_with_meta: Iterable[Dict[str, Any]],
+    on_progress: Optional[Callable[[int], None]] = None,
+) -> int:
+    """
+    Streaming ingest: encode chunks in fixed-size batches and upsert them in parallel
+    with wait=False, then wait on a final barrier so the data is searchable on return.
+    At most UPSERT_PARALLELISM batches are held in memory, whatever the document size.
+    `on_progress(n)` is called with the running count of stored chunks.
+    Returns the number of chunks stored.
+    """
     ensure_collection()
-    texts = [c.get("text", "") for c in chunks_with_meta]
-    vectors = embedding_model.encode(texts)
-
-    points = []
-    for vec, item in zip(vectors, chunks_with_meta):
-        payload = {
-            "text": item.get("text", ""),
-            "metadata": item.get("metadata", {}),
-        }
-        points.append(
-            qmodels.PointStruct(
-                id=str(uuid.uuid4()),
-                vector=np.asarray(vec, dtype=float).tolist(),
-                payload=payload,
+    model = get_embedding_model()
+    inflight: Deque[Tuple[Future, int]] = deque()
+    done = 0
+
+    def settle_oldest():
+        nonlocal done
+        fut, n = inflight.popleft()
+        fut.result()  # re-raise upsert errors
+        done += n
+        if on_progress:
+            on_progress(done)
+
+    pending_last = None
+    with revalidate_on_error(), ThreadPoolExecutor(max_workers=UPSERT_PARALLELISM, thread_name_prefix="qdrant-upsert") as pool:
+        for batch in _iter_batches(chunks_with_meta, INGEST_EMBED_BATCH):
+            vectors = np.asarray(
+                model.encode([c.get("text", "") for c in batch], batch_size=INGEST_EMBED_BATCH),
+                dtype=np.float32,
             )
-        )
+            # Hold one batch back: it is sent last with wait=True as the barrier
+            if pending_last is not None:
+                while len(inflight) >= UPSERT_PARALLELISM:
+                    settle_oldest()
+                prev_batch, prev_vectors = pending_last
+                inflight.append((pool.submit(_upsert_batch, prev_batch, prev_vectors, False), len(prev_batch)))
+            while inflight and inflight[0][0].done():
+                settle_oldest()
+            pending_last = (batch, vectors)
+
+        while inflight:
+            settle_oldest()
+
+    if pending_last is not None:
+        # Submitted after every other batch was acknowledged, so when this one is applied
+        # (wait=True) the earlier ones are too: updates are applied in WAL order.
+        last_batch, last_vectors = pending_last
+        with revalidate_on_error():
+            _upsert_batch(last_batch, last_vectors, wait=True)
+        done += len(last_batch)
+        if on_progress:
+            on_progress(done)
+
+    if done:
+        bump_collection_version()
+    return done
 
-    qdrant.upsert(collection_name=QDRANT_COLLECTION, points=points)
+
+def delete_document_vectors(pdf_name: str):
+    """Remove every chunk that was ingested from the given PDF."""
+    delete_source_vectors(pdf_name)
+
+
+def delete_source_vectors(key: str):
+    """Remove every chunk whose source (PDF name or URL) is `key`."""
+    _delete(qmodels.FilterSelector(
+        filter=qmodels.Filter(should=[
+            qmodels.FieldCondition(key="metadata.pdf_name", match=qmodels.MatchValue(value=key)),
+            qmodels.FieldCondition(key="metadata.source", match=qmodels.MatchValue(value=key)),
+        ])
+    ))
+
+
+def delete_points(point_ids: List[str]):
+    if not point_ids:
+        return
+    _delete(qmodels.PointIdsList(points=list(point_ids)))
+
+
+def _delete(selector):
+    """
+    Delete through both aliases: during a migration the write alias points at the new
+    collection and the read alias at the old one, and the point may be in either.
+    Outside a migration both resolve to the same collection and the second call is a no-op.
+    """
+    ensure_collection()
+    with revalidate_on_error():
+        for name in (WRITE_COLLECTION, QDRANT_COLLECTION):
+            get_qdrant().delete(collection_name=name, points_selector=selector, wait=True)
+    bump_collection_version()
 
 
 # =========================
@@ -136,23 +270,127 @@ def embed_chunks_with_metadata(chunks_with_meta: List[Dict[str, Any]]):
 def embed_query_and_search(query: str, k: int = 3, require_domain: str = None, score_threshold: float = 0.6):
     """
     Search top-k chunks with similarity scores.
-    Returns: list of dicts {"text":..., "metadata":..., "score":...}
+    Returns: list of dicts {"id":..., "text":..., "metadata":..., "score":...}
     """
+    qkey = _normalize_query(query)
+    query_vector = query_vector_cache.get(qkey)
+    if query_vector is None:
+        query_vector = _encode_query(query)
+        query_vector_cache.set(qkey, query_vector)
+
     ensure_collection()
-    query_vector = embedding_model.encode([query])[0].astype(float).tolist()
+    hybrid = hybrid_available()
+    skey = _search_key(query_vector, k, score_threshold, qkey if hybrid else "")
+    cached = search_results_cache.get(skey)
+    if cached is not None:
+        return _copy_results(cached)
 
     # Domain filtering disabled: always search across all documents
     q_filter = None
 
-    hits = qdrant.search(
+    with revalidate_on_error():
+        t0 = time.perf_counter()
+        hits = get_qdrant().search(
+            collection_name=QDRANT_COLLECTION,
+            query_vector=query_vector,
+            limit=k,
+            query_filter=q_filter,
+            search_params=dense_search_params(),
+            with_payload=True,
+            with_vectors=False,
+        )
+        latencies.record("retrieval.dense", (time.perf_counter() - t0) * 1000)
+        sparse_hits = None
+        if hybrid:
+            t0 = time.perf_counter()
+            sparse_hits = get_qdrant().search(**_sparse_search_args(query, k))
+            latencies.record("retrieval.sparse", (time.perf_counter() - t0) * 1000)
+    if sparse_hits is not None:
+        results = _fuse(hits, sparse_hits, k, score_threshold)
+    else:
+        results = _hits_to_results(hits, score_threshold)
+    search_results_cache.set(skey, results)
+    return _copy_results(results)
+
+
+async def embed_query_and_search_async(query: str, k: int = 3, require_domain: str = None, score_threshold: float = 0.6):
+    """
+    Non-blocking variant of embed_query_and_search for request handlers.
+    The encode goes through the query micro-batcher; the search uses the async Qdrant client
+    and, when the collection has a sparse vector, fuses dense and lexical results (RRF).
+    Both levels are served from the retrieval caches when possible.
+    """
+    query_vector = await embed_query_async(query)
+
+    if not collection_ready():
+        # Bootstrap (first request, or after /reset or a failed Qdrant call); free afterwards
+        loop = asyncio.get_running_loop()
+        await loop.run_in_executor(_query_executor, contextvars.copy_context().run, ensure_collection)
+    hybrid = hybrid_available()
+    skey = _search_key(query_vector, k, score_threshold, _normalize_query(query) if hybrid else "")
+    cached = search_results_cache.get(skey)
+    if cached is not None:
+        return _copy_results(cached)
+
+    client = get_async_qdrant()
+
+    async def timed(stage: str, **kwargs):
+        t0 = time.perf_counter()
+        hits = await client.search(**kwargs)
+        latencies.record(stage, (time.perf_counter() - t0) * 1000)
+        return hits
+
+    dense_search = timed(
+        "retrieval.dense",
         collection_name=QDRANT_COLLECTION,
         query_vector=query_vector,
         limit=k,
-        query_filter=q_filter,
+        query_filter=None,
+        search_params=dense_search_params(),
         with_payload=True,
         with_vectors=False,
     )
+    with revalidate_on_error():
+        if hybrid:
+            # Dense and lexical retrievers run concurrently, then reciprocal rank fusion
+            hits, sparse_hits = await asyncio.gather(dense_search, timed("retrieval.sparse", **_sparse_search_args(query, k)))
+            results = _fuse(hits, sparse_hits, k, score_threshold)
+        else:
+            results = _hits_to_results(await dense_search, score_threshold)
+    search_results_cache.set(skey, results)
+    return _copy_results(results)
+
+
+async def embed_query_async(query: str) -> List[float]:
+    """Query vector via the level-1 cache, falling back to the micro-batcher."""
+    qkey = _normalize_query(query)
+    query_vector = query_vector_cache.get(qkey)
+    if query_vector is None:
+        query_vector = await query_batcher.embed(query)
+        query_vector_cache.set(qkey, query_vector)
+    return query_vector
+
+
+def _encode_query(query: str) -> List[float]:
+    return get_embedding_model().encode([query])[0].astype(float).tolist()
+
+
+def _encode_queries(queries) -> List[List[float]]:
+    vectors = get_embedding_model().encode(list(queries), batch_size=max(1, len(queries)))
+    return [np.asarray(v, dtype=float).tolist() for v in vectors]
+
+
+# Concurrent chat requests are coalesced into one encode call per few milliseconds
+query_batcher = EmbeddingBatcher(
+    _encode_queries,
+    _query_executor,
+    max_batch=EMBED_BATCH_MAX_SIZE,
+    max_wait_ms=EMBED_BATCH_MAX_WAIT_MS,
+    max_inflight=QUERY_ENCODE_WORKERS,
+)
+
 
+def _hits_to_results(hits, score_threshold: float) -> List[Dict[str, Any]]:
     results: List[Dict[str, Any]] = []
     for h in hits:
         payload = h.payload or {}
@@ -160,13 +398,66 @@ def embed_query_and_search(query: str, k: int = 3, require_domain: str = None, s
         meta = payload.get("metadata", {})
         score = h.score
         if text and score >= score_threshold:  # only return confident matches
-            results.append({"text": text, "metadata": meta, "score": score})
+            results.append({"id": str(h.id), "text": text, "metadata": meta, "score": score})
 
     # fallback removed: no domain restrictions applied
 
     return results
 
 
+def _sparse_search_args(query: str, k: int) -> Dict[str, Any]:
+    indices, values = sparse_encoder.encode_query(query)
+    return {
+        "collection_name": QDRANT_COLLECTION,
+        "query_vector": qmodels.NamedSparseVector(
+            name=SPARSE_VECTOR_NAME,
+            vector=qmodels.SparseVector(indices=indices, values=values),
+        ),
+        "limit": max(k, SPARSE_TOP_K),
+        "with_payload": True,
+        "with_vectors": False,
+    }
+
+
+def _fuse(dense_hits, sparse_hits, k: int, score_threshold: float) -> List[Dict[str, Any]]:
+    """
+    Reciprocal rank fusion of dense hits (above the threshold) and lexical hits.
+    Lexical hits need SPARSE_MIN_SCORE, and lexical-only hits are kept only when at least
+    one dense hit passes the threshold: one shared term must not pull an off-topic
+    question into the prompt. "score" stays the dense cosine similarity where known.
+    """
+    t0 = time.perf_counter()
+    dense_ok = [h for h in dense_hits if h.score >= score_threshold]
+    if not dense_ok:
+        latencies.record("retrieval.fusion", (time.perf_counter() - t0) * 1000)
+        return []
+    dense_scores = {str(h.id): h.score for h in dense_hits}
+    sparse_ok = [h for h in sparse_hits if h.score >= SPARSE_MIN_SCORE]
+
+    fused: Dict[str, Dict[str, Any]] = {}
+    for retriever, hits in (("dense", dense_ok), ("sparse", sparse_ok)):
+        for rank, h in enumerate(hits):
+            payload = h.payload or {}
+            if not payload.get("text"):
+                continue
+            pid = str(h.id)
+            item = fused.get(pid)
+            if item is None:
+                item = fused[pid] = {
+                    "id": pid,
+                    "text": payload.get("text", ""),
+                    "metadata": payload.get("metadata", {}),
+                    "score": dense_scores.get(pid, 0.0),
+                    "rrf_score": 0.0,
+                }
+            item["rrf_score"] += 1.0 / (RRF_K + rank + 1)
+            if retriever == "sparse":
+                item["lexical_score"] = h.score
+    results = sorted(fused.values(), key=lambda r: r["rrf_score"], reverse=True)[:k]
+    latencies.record("retrieval.fusion", (time.perf_counter() - t0) * 1000)
+    return results
+
+
 # =========================
 # Compatibility
 # =========================
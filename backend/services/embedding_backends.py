@@ -0,0 +1,148 @@
+import os
+from typing import List, Optional, Sequence
+
+import numpy as np
+
+
+class EmbeddingBackend:
+    """
+    Minimal interface every embedding backend implements.
+    `encode` returns a float32 array of shape (len(texts), dim), L2-normalized
+    like the sentence-transformers MiniLM pipeline.
+    """
+
+    name = "base"
+
+    def encode(self, texts: Sequence[str], batch_size: int = 32) -> np.ndarray:
+        raise NotImplementedError
+
+    def count_tokens(self, texts: Sequence[str]) -> List[int]:
+        """Tokenizer length of each text, without special tokens and without truncation."""
+        raise NotImplementedError
+
+    @property
+    def max_seq_length(self) -> int:
+        return 256
+
+
+# =========================
+# sentence-transformers (torch)
+# =========================
+class SentenceTransformerBackend(EmbeddingBackend):
+    name = "sentence-transformers"
+
+    def __init__(self, model_name: str):
+        from sentence_transformers import SentenceTransformer  # heavy: pulls in torch
+        self._model = SentenceTransformer(model_name)
+
+    def encode(self, texts: Sequence[str], batch_size: int = 32) -> np.ndarray:
+        vectors = self._model.encode(list(texts), batch_size=batch_size, convert_to_numpy=True)
+        return np.asarray(vectors, dtype=np.float32)
+
+    def count_tokens(self, texts: Sequence[str]) -> List[int]:
+        if not texts:
+            return []
+        ids = self._model.tokenizer(list(texts), add_special_tokens=False, truncation=False)["input_ids"]
+        return [len(x) for x in ids]
+
+    @property
+    def max_seq_length(self) -> int:
+        return int(self._model.max_seq_length)
+
+
+# =========================
+# ONNX Runtime (fp32 / dynamic int8)
+# =========================
+class OnnxEmbeddingBackend(EmbeddingBackend):
+    """
+    MiniLM on ONNX Runtime: tokenizer.json + transformer graph, then mean pooling
+    and L2 normalization (the same head sentence-transformers applies).
+
+    Model files come from `model_dir` when given (see scripts/export_onnx_embedder.py),
+    otherwise from the Hugging Face hub repo of the sentence-transformers model.
+    With `quantized=True` a dynamic int8 copy is created next to the fp32 graph on first use.
+    """
+
+    def __init__(self, model_name: str, model_dir: Optional[str] = None, quantized: bool = False,
+                 max_seq_length: int = 256, threads: int = 0):
+        import onnxruntime as ort
+        from tokenizers import Tokenizer
+
+        model_path, tokenizer_path = self._resolve_files(model_name, model_dir)
+        if quantized:
+            model_path = self._quantized_path(model_path)
+        self.name = "onnx-int8" if quantized else "onnx"
+
+        self._tokenizer = Tokenizer.from_file(tokenizer_path)
+        self._tokenizer.enable_truncation(max_length=max_seq_length)
+        self._tokenizer.enable_padding()
+        # For chunk sizing: tokenizer.json may ship with truncation/fixed padding (the hub's
+        # MiniLM one does), which would make every count the same
+        self._counter = Tokenizer.from_file(tokenizer_path)
+        self._counter.no_truncation()
+        self._counter.no_padding()
+        self._max_seq_length = max_seq_length
+
+        opts = ort.SessionOptions()
+        opts.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+        if threads:
+            opts.intra_op_num_threads = threads
+        self._session = ort.InferenceSession(model_path, sess_options=opts, providers=["CPUExecutionProvider"])
+        self._input_names = {i.name for i in self._session.get_inputs()}
+
+    @staticmethod
+    def _resolve_files(model_name: str, model_dir: Optional[str]):
+        if model_dir:
+            return os.path.join(model_dir, "model.onnx"), os.path.join(model_dir, "tokenizer.json")
+        from huggingface_hub import hf_hub_download
+        repo = model_name if "/" in model_name else f"sentence-transformers/{model_name}"
+        return hf_hub_download(repo, "onnx/model.onnx"), hf_hub_download(repo, "tokenizer.json")
+
+    @staticmethod
+    def _quantized_path(model_path: str) -> str:
+        out = os.path.splitext(model_path)[0] + ".int8.onnx"
+        if not os.path.exists(out):
+            from onnxruntime.quantization import quantize_dynamic, QuantType
+            quantize_dynamic(model_path, out, weight_type=QuantType.QInt8)
+        return out
+
+    def encode(self, texts: Sequence[str], batch_size: int = 32) -> np.ndarray:
+        texts = list(texts)
+        out: List[np.ndarray] = []
+        for i in range(0, len(texts), max(1, batch_size)):
+            encs = self._tokenizer.encode_batch(texts[i:i + batch_size])
+            ids = np.array([e.ids for e in encs], dtype=np.int64)
+            mask = np.array([e.attention_mask for e in encs], dtype=np.int64)
+            feeds = {"input_ids": ids, "attention_mask": mask}
+            if "token_type_ids" in self._input_names:
+                feeds["token_type_ids"] = np.zeros_like(ids)
+            hidden = self._session.run(None, feeds)[0]  # (batch, seq, dim)
+
+            # Mean pooling over real tokens, then L2 normalize
+            m = mask[..., None].astype(np.float32)
+            pooled = (hidden * m).sum(axis=1) / np.clip(m.sum(axis=1), 1e-9, None)
+            pooled /= np.clip(np.linalg.norm(pooled, axis=1, keepdims=True), 1e-12, None)
+            out.append(pooled.astype(np.float32))
+        if not out:
+            return np.zeros((0, 0), dtype=np.float32)
+        return np.concatenate(out, axis=0)
+
+    def count_tokens(self, texts: Sequence[str]) -> List[int]:
+        if not texts:
+            return []
+        return [len(e.ids) for e in self._counter.encode_batch(list(texts), add_special_tokens=False)]
+
+    @property
+    def max_seq_length(self) -> int:
+        return self._max_seq_length
+
+
+def create_backend(kind: str, model_name: str, model_dir: Optional[str] = None, threads: int = 0) -> EmbeddingBackend:
+    kind = (kind or "sentence-transformers").lower()
+    if kind in ("sentence-transformers", "torch", "st"):
+        return SentenceTransformerBackend(model_name)
+    if kind == "onnx":
+        return OnnxEmbeddingBackend(model_name, model_dir=model_dir, threads=threads)
+    if kind in ("onnx-int8", "onnx_int8"):
+        return OnnxEmbeddingBackend(model_name, model_dir=model_dir, quantized=True, threads=threads)
+    raise ValueError(f"Unknown EMBEDDING_BACKEND: {kind}")
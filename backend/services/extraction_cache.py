@@ -0,0 +1,105 @@
+import json
+import os
+import sqlite3
+import threading
+import time
+from typing import Any, Dict, List, Optional
+
+from config import EXTRACTION_CACHE_PATH, EXTRACTION_CACHE_MAX_MB
+
+
+class ExtractionCache:
+    """
+    On-disk cache of per-page extraction results and summaries, keyed by
+    SHA-256 of the file bytes plus the extractor version.
+    Evicts least recently used entries once the stored payload exceeds `max_bytes`.
+    """
+
+    def __init__(self, path: str, max_bytes: int):
+        self.path = path
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        self._conn: Optional[sqlite3.Connection] = None
+        self.hits = 0
+        self.misses = 0
+
+    def _db(self) -> sqlite3.Connection:
+        if self._conn is None:
+            os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+            conn = sqlite3.connect(self.path, check_same_thread=False)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute(
+                """CREATE TABLE IF NOT EXISTS extractions (
+                    key TEXT PRIMARY KEY,
+                    pages TEXT NOT NULL,
+                    summary TEXT,
+                    size INTEGER NOT NULL,
+                    created_at REAL NOT NULL,
+                    last_access REAL NOT NULL
+                )"""
+            )
+            conn.execute("CREATE INDEX IF NOT EXISTS idx_extractions_access ON extractions(last_access)")
+            conn.commit()
+            self._conn = conn
+        return self._conn
+
+    @staticmethod
+    def _key(file_hash: str, version: str) -> str:
+        return f"{file_hash}:{version}"
+
+    def get(self, file_hash: str, version: str) -> Optional[Dict[str, Any]]:
+        key = self._key(file_hash, version)
+        with self._lock:
+            db = self._db()
+            row = db.execute("SELECT pages, summary FROM extractions WHERE key = ?", (key,)).fetchone()
+            if row is None:
+                self.misses += 1
+                return None
+            db.execute("UPDATE extractions SET last_access = ? WHERE key = ?", (time.time(), key))
+            db.commit()
+            self.hits += 1
+        return {"pages": json.loads(row[0]), "summary": row[1]}
+
+    def put_pages(self, file_hash: str, version: str, pages: List[Dict[str, Any]]):
+        key = self._key(file_hash, version)
+        body = json.dumps(pages, ensure_ascii=False)
+        now = time.time()
+        with self._lock:
+            db = self._db()
+            db.execute(
+                """INSERT INTO extractions (key, pages, summary, size, created_at, last_access)
+                   VALUES (?, ?, NULL, ?, ?, ?)
+                   ON CONFLICT(key) DO UPDATE SET pages = excluded.pages, size = excluded.size,
+                                                  last_access = excluded.last_access""",
+                (key, body, len(body.encode("utf-8")), now, now),
+            )
+            db.commit()
+            self._evict(db)
+
+    def put_summary(self, file_hash: str, version: str, summary: str):
+        with self._lock:
+            db = self._db()
+            db.execute(
+                "UPDATE extractions SET summary = ?, size = size + ? WHERE key = ?",
+                (summary, len(summary.encode("utf-8")), self._key(file_hash, version)),
+            )
+            db.commit()
+
+    def _evict(self, db: sqlite3.Connection):
+        total = db.execute("SELECT COALESCE(SUM(size), 0) FROM extractions").fetchone()[0]
+        if total <= self.max_bytes:
+            return
+        for key, size in db.execute("SELECT key, size FROM extractions ORDER BY last_access ASC").fetchall():
+            if total <= self.max_bytes:
+                break
+            db.execute("DELETE FROM extractions WHERE key = ?", (key,))
+            total -= size
+        db.commit()
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            count, total = self._db().execute("SELECT COUNT(*), COALESCE(SUM(size), 0) FROM extractions").fetchone()
+        return {"entries": count, "bytes": total, "max_bytes": self.max_bytes, "hits": self.hits, "misses": self.misses}
+
+
+extraction_cache = ExtractionCache(EXTRACTION_CACHE_PATH, int(EXTRACTION_CACHE_MAX_MB * 1024 * 1024))
@@ -1,18 +1,57 @@
 import os
+import hashlib
+import tempfile
+from typing import BinaryIO, Tuple
+
+import anyio
 from fastapi import UploadFile
+from config import MAX_UPLOAD_MB
 
 UPLOAD_DIR = "uploads"
+COPY_CHUNK_BYTES = 1024 * 1024
+MAX_UPLOAD_BYTES = int(MAX_UPLOAD_MB * 1024 * 1024)
 
 # Ensure upload folder exists
 os.makedirs(UPLOAD_DIR, exist_ok=True)
 
-def save_uploaded_file(uploaded_file: UploadFile) -> str:
-    """
-    Saves uploaded file to uploads/ and returns full path.
-    """
-    file_path = os.path.join(UPLOAD_DIR, uploaded_file.filename)
 
-    with open(file_path, "wb") as f:
-        f.write(uploaded_file.file.read())
+class UploadTooLargeError(Exception):
+    """Raised when an upload exceeds MAX_UPLOAD_MB."""
+
 
-    return file_path
+def _copy_stream(src: BinaryIO, dest_path: str, max_bytes: int) -> Tuple[str, int]:
+    """Copy in fixed-size chunks, hashing in the same pass and enforcing the exact file-size cap."""
+    h = hashlib.sha256()
+    size = 0
+    fd, tmp_path = tempfile.mkstemp(dir=UPLOAD_DIR, prefix=".upload-")
+    try:
+        with os.fdopen(fd, "wb") as out:
+            while True:
+                block = src.read(COPY_CHUNK_BYTES)
+                if not block:
+                    break
+                size += len(block)
+                if size > max_bytes:
+                    raise UploadTooLargeError(f"File exceeds the {MAX_UPLOAD_MB:g} MB upload limit.")
+                h.update(block)
+                out.write(block)
+        os.replace(tmp_path, dest_path)  # atomic: readers never see a partial file
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+    return h.hexdigest(), size
+
+
+async def save_uploaded_file(uploaded_file: UploadFile) -> Tuple[str, str]:
+    """
+    Copies the uploaded file into uploads/ and hashes it in one pass.
+    The multipart parser has already spooled the body to an anonymous temp file, which
+    cannot be renamed into place; the request body itself is capped while it is
+    received (RequestMiddleware in main.py).
+    Returns (full path, sha256 hex digest of the bytes).
+    """
+    filename = os.path.basename(uploaded_file.filename or "upload.pdf")
+    file_path = os.path.join(UPLOAD_DIR, filename)
+    file_hash, _ = await anyio.to_thread.run_sync(_copy_stream, uploaded_file.file, file_path, MAX_UPLOAD_BYTES)
+    return file_path, file_hash
@@ -0,0 +1,138 @@
+import asyncio
+import hashlib
+from typing import Any, Dict, List, Optional
+
+import anyio
+
+from services.job_queue import update_job
+from services.pdf_parser import extract_text_by_page_with_meta, EXTRACTOR_VERSION
+from services.extraction_cache import extraction_cache
+from services.embedder import (
+    page_texts_to_chunks, embed_chunks_with_metadata, web_text_to_chunks,
+    chunk_point_id, chunk_fingerprint, delete_points, delete_source_vectors,
+)
+from services.manifest_service import get_manifest, save_manifest
+from services.summarizer import generate_summary_async
+from services.web_scraper import fetch_and_extract
+
+
+# =========================
+# Shared stages
+# =========================
+async def _summarize(job: Dict[str, Any], text: str, cached: Optional[str] = None, file_hash: Optional[str] = None) -> str:
+    if cached:
+        update_job(job, progress={"summary_ready": True})
+        return cached
+    update_job(job, stage="summarizing")
+    summary = await generate_summary_async(text)
+    if file_hash and not summary.startswith("Error generating summary"):
+        await anyio.to_thread.run_sync(extraction_cache.put_summary, file_hash, EXTRACTOR_VERSION, summary)
+    update_job(job, progress={"summary_ready": True})
+    return summary
+
+
+def _sha256_file(path: str) -> str:
+    h = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1024 * 1024), b""):
+            h.update(block)
+    return h.hexdigest()
+
+
+async def index_document(key: str, kind: str, chunks_with_meta: List[Dict[str, Any]], on_plan=None, on_progress=None) -> Dict[str, int]:
+    """
+    Idempotent (re-)ingestion of one source against its stored manifest:
+    unchanged chunks are skipped (no re-embedding), new or changed ones are upserted
+    under their deterministic ids, and chunks that vanished from the source are deleted.
+    """
+    # Deterministic ids; identical chunks within one document collapse to one point
+    current: Dict[str, Dict[str, Any]] = {}
+    for c in chunks_with_meta:
+        current.setdefault(chunk_point_id(c), c)
+    fingerprints = {pid: chunk_fingerprint(c) for pid, c in current.items()}
+
+    manifest = await get_manifest(key)
+    if manifest is None:
+        # First managed ingest of this source: clear points from older random-id ingests
+        await anyio.to_thread.run_sync(delete_source_vectors, key)
+        previous: Dict[str, str] = {}
+    else:
+        previous = manifest.get("chunks") or {}
+
+    to_embed = [c for pid, c in current.items() if previous.get(pid) != fingerprints[pid]]
+    vanished = [pid for pid in previous if pid not in current]
+    stats = {"chunks_total": len(to_embed), "chunks_skipped": len(current) - len(to_embed), "chunks_deleted": len(vanished)}
+    if on_plan:
+        on_plan(stats)
+
+    if to_embed:
+        await anyio.to_thread.run_sync(embed_chunks_with_metadata, to_embed, on_progress)
+    if vanished:
+        await anyio.to_thread.run_sync(delete_points, vanished)
+    if to_embed or vanished or manifest is None:
+        await save_manifest(key, kind, fingerprints)
+    return stats
+
+
+async def _embed(job: Dict[str, Any], key: str, kind: str, chunks_with_meta: List[Dict[str, Any]]):
+    """Embed + upsert only what changed; progress is reported per stored batch."""
+    update_job(job, stage="embedding")
+    await index_document(
+        key, kind, chunks_with_meta,
+        on_plan=lambda stats: update_job(job, progress=stats),
+        on_progress=lambda n: update_job(job, progress={"chunks_embedded": n}),
+    )
+
+
+# =========================
+# PDF ingestion
+# =========================
+async def ingest_pdf(job: Dict[str, Any], file_path: str, filename: str, file_hash: Optional[str] = None) -> Dict[str, Any]:
+    # 1. Extract text by page (blocking: Gemini / PyMuPDF / OCR), unless this exact file was seen before
+    update_job(job, stage="extracting")
+    if file_hash is None:
+        file_hash = await anyio.to_thread.run_sync(_sha256_file, file_path)
+    cached = await anyio.to_thread.run_sync(extraction_cache.get, file_hash, EXTRACTOR_VERSION)
+    if cached:
+        pages = cached["pages"]
+    else:
+        pages = await anyio.to_thread.run_sync(extract_text_by_page_with_meta, file_path)
+        if any(p["text"].strip() for p in pages):
+            await anyio.to_thread.run_sync(extraction_cache.put_pages, file_hash, EXTRACTOR_VERSION, pages)
+    update_job(job, progress={"pages_extracted": len(pages), "extraction_cached": bool(cached)})
+
+    if not any(p["text"].strip() for p in pages):
+        raise ValueError("Uploaded PDF is empty or unreadable.")
+
+    # 2. Summary and chunk/embed run side by side (embedding dedupes against the manifest)
+    full_text = " ".join(p["text"] for p in pages if p["text"].strip())
+    chunks_with_meta = []
+    for p in pages:
+        chunks_with_meta.extend(page_texts_to_chunks(
+            page_texts=[(p["page_number"], p["text"])], pdf_name=filename, source_type=p["source_type"],
+        ))
+    summary, _ = await asyncio.gather(
+        _summarize(job, full_text, cached=(cached or {}).get("summary"), file_hash=file_hash),
+        _embed(job, filename, "pdf", chunks_with_meta),
+    )
+    return {"filename": filename, "summary": summary}
+
+
+# =========================
+# URL ingestion
+# =========================
+async def ingest_url(job: Dict[str, Any], url: str) -> Dict[str, Any]:
+    update_job(job, stage="fetching")
+    extracted = await fetch_and_extract(url)
+    text = (extracted.get("text") or "").strip()
+    title = extracted.get("title")
+    if not text:
+        raise ValueError("Could not extract readable content from URL.")
+    update_job(job, progress={"pages_extracted": 1})
+
+    chunks_with_meta = web_text_to_chunks(text=text, url=url, title=title)
+    summary, _ = await asyncio.gather(
+        _summarize(job, text),
+        _embed(job, url, "url", chunks_with_meta),
+    )
+    return {"url": url, "title": title, "summary": summary}
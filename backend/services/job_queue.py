@@ -0,0 +1,135 @@
+import asyncio
+import time
+import uuid
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, Dict, List, Optional
+
+from config import INGEST_WORKERS, INGEST_QUEUE_SIZE, INGEST_JOB_RETENTION
+
+
+class QueueFullError(Exception):
+    """Raised when the ingestion queue cannot accept more work."""
+
+
+# =========================
+# Job registry
+# =========================
+# job_id -> job dict. Finished jobs are kept for polling and evicted oldest-first.
+_jobs: "OrderedDict[str, Dict[str, Any]]" = OrderedDict()
+_queue: Optional[asyncio.Queue] = None
+_workers: List[asyncio.Task] = []
+
+
+def _new_job(kind: str, owner_id: str, source: str) -> Dict[str, Any]:
+    now = time.time()
+    return {
+        "id": uuid.uuid4().hex,
+        "kind": kind,              # "pdf" | "url"
+        "owner_id": owner_id,
+        "source": source,          # filename or URL
+        "status": "queued",        # queued | running | done | failed
+        "stage": "queued",
+        "progress": {
+            "pages_extracted": 0,
+            "chunks_total": 0,
+            "chunks_embedded": 0,
+            "chunks_skipped": 0,
+            "chunks_deleted": 0,
+            "summary_ready": False,
+            "extraction_cached": False,
+        },
+        "result": None,
+        "error": None,
+        "created_at": now,
+        "updated_at": now,
+    }
+
+
+def _evict_finished():
+    """Keep the registry bounded by dropping the oldest finished jobs."""
+    if len(_jobs) <= INGEST_JOB_RETENTION:
+        return
+    for job_id in list(_jobs.keys()):
+        if len(_jobs) <= INGEST_JOB_RETENTION:
+            break
+        if _jobs[job_id]["status"] in ("done", "failed"):
+            del _jobs[job_id]
+
+
+def update_job(job: Dict[str, Any], **fields):
+    progress = fields.pop("progress", None)
+    if progress:
+        job["progress"].update(progress)
+    job.update(fields)
+    job["updated_at"] = time.time()
+
+
+def get_job(job_id: str) -> Optional[Dict[str, Any]]:
+    return _jobs.get(job_id)
+
+
+def queue_depth() -> int:
+    return _queue.qsize() if _queue is not None else 0
+
+
+# =========================
+# Submission
+# =========================
+def check_capacity():
+    """Raise QueueFullError now rather than after expensive request work (e.g. saving an upload)."""
+    if _queue is not None and _queue.full():
+        raise QueueFullError("Ingestion queue is full, please retry shortly.")
+
+
+def submit_job(kind: str, owner_id: str, source: str, runner: Callable[[Dict[str, Any]], Awaitable[Any]]) -> Dict[str, Any]:
+    """
+    Register a job and enqueue it without waiting.
+    Raises QueueFullError when the bounded queue is at capacity (back-pressure).
+    """
+    if _queue is None:
+        raise RuntimeError("Ingestion workers are not running.")
+    job = _new_job(kind, owner_id, source)
+    try:
+        _queue.put_nowait((job, runner))
+    except asyncio.QueueFull:
+        raise QueueFullError("Ingestion queue is full, please retry shortly.")
+    _jobs[job["id"]] = job
+    _evict_finished()
+    return job
+
+
+# =========================
+# Worker pool
+# =========================
+async def _worker(n: int):
+    assert _queue is not None
+    while True:
+        job, runner = await _queue.get()
+        try:
+            update_job(job, status="running", stage="starting")
+            result = await runner(job)
+            update_job(job, status="done", stage="done", result=result)
+        except asyncio.CancelledError:
+            update_job(job, status="failed", error="Cancelled during shutdown")
+            raise
+        except Exception as e:
+            print(f"❌ Ingestion job {job['id']} failed: {e}")
+            update_job(job, status="failed", error=str(e))
+        finally:
+            _queue.task_done()
+
+
+def start_workers():
+    global _queue
+    if _workers:
+        return
+    _queue = asyncio.Queue(maxsize=INGEST_QUEUE_SIZE)
+    for n in range(INGEST_WORKERS):
+        _workers.append(asyncio.create_task(_worker(n)))
+
+
+async def stop_workers():
+    for t in _workers:
+        t.cancel()
+    await asyncio.gather(*_workers, return_exceptions=True)
+    _workers.clear()
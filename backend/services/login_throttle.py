@@ -0,0 +1,71 @@
+import threading
+import time
+from collections import OrderedDict, deque
+from typing import Deque, Iterable, Tuple
+
+from config import LOGIN_MAX_FAILURES, LOGIN_MAX_FAILURES_PER_IP, LOGIN_FAILURE_WINDOW
+
+
+class LoginThrottle:
+    """
+    Sliding-window count of failed logins per key ("email:..." / "ip:...").
+    Once a key reaches its limit, further attempts are refused without spending
+    a bcrypt verification until the oldest failure leaves the window.
+    """
+
+    def __init__(self, window_seconds: float, max_keys: int = 10000):
+        self.window = window_seconds
+        self.max_keys = max_keys
+        self._failures: "OrderedDict[str, Deque[float]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.throttled = 0
+
+    def _recent(self, key: str, now: float) -> Deque[float]:
+        times = self._failures.get(key)
+        if times is None:
+            return deque()
+        while times and times[0] <= now - self.window:
+            times.popleft()
+        if not times:
+            del self._failures[key]
+        return times
+
+    def retry_after(self, keys: Iterable[Tuple[str, int]]) -> float:
+        """Seconds until an attempt is allowed for every (key, limit); 0 when allowed now."""
+        now = time.monotonic()
+        wait = 0.0
+        with self._lock:
+            for key, limit in keys:
+                times = self._recent(key, now)
+                if len(times) >= limit:
+                    wait = max(wait, times[len(times) - limit] + self.window - now)
+        if wait > 0:
+            self.throttled += 1
+        return wait
+
+    def record_failure(self, keys: Iterable[Tuple[str, int]]):
+        now = time.monotonic()
+        with self._lock:
+            for key, _ in keys:
+                times = self._failures.setdefault(key, deque())
+                times.append(now)
+                self._failures.move_to_end(key)
+            while len(self._failures) > self.max_keys:
+                self._failures.popitem(last=False)
+
+    def reset(self, key: str):
+        with self._lock:
+            self._failures.pop(key, None)
+
+    def stats(self):
+        return {"tracked_keys": len(self._failures), "throttled": self.throttled}
+
+
+login_throttle = LoginThrottle(LOGIN_FAILURE_WINDOW)
+
+
+def login_keys(email: str, client_ip: str):
+    return [
+        (f"email:{(email or '').strip().lower()}", LOGIN_MAX_FAILURES),
+        (f"ip:{client_ip}", LOGIN_MAX_FAILURES_PER_IP),
+    ]
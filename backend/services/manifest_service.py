@@ -0,0 +1,29 @@
+# backend/services/manifest_service.py
+from db import files_meta_col
+import datetime
+
+# One manifest per ingested source (PDF filename or URL): point id -> chunk fingerprint
+MANIFEST_TYPE = "ingest_manifest"
+
+async def get_manifest(source_key: str):
+    return await files_meta_col.find_one({"type": MANIFEST_TYPE, "source_key": source_key})
+
+async def save_manifest(source_key: str, kind: str, chunks: dict):
+    await files_meta_col.update_one(
+        {"type": MANIFEST_TYPE, "source_key": source_key},
+        {"$set": {
+            "kind": kind,
+            "chunks": chunks,
+            "chunk_count": len(chunks),
+            "updated_at": datetime.datetime.utcnow(),
+        }},
+        upsert=True,
+    )
+
+async def delete_manifest(source_key: str):
+    res = await files_meta_col.delete_one({"type": MANIFEST_TYPE, "source_key": source_key})
+    return res.deleted_count
+
+async def clear_manifests():
+    res = await files_meta_col.delete_many({"type": MANIFEST_TYPE})
+    return res.deleted_count
@@ -0,0 +1,52 @@
+import asyncio
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, Optional, Tuple
+
+from auth import hash_password, verify_and_update_password
+from config import PASSWORD_HASH_WORKERS, PASSWORD_HASH_MAX_PENDING
+from services.perf_metrics import latencies
+
+
+class PasswordPoolBusyError(Exception):
+    pass
+
+
+# bcrypt is deliberately slow (100-300 ms of CPU); it runs here instead of on the event loop.
+# The pool is small so a login burst can't starve query encoding and ingestion of CPU.
+_executor = ThreadPoolExecutor(max_workers=PASSWORD_HASH_WORKERS, thread_name_prefix="bcrypt")
+_pending = 0  # submitted and not finished; only touched on the event loop
+_stats: Dict[str, int] = {"hashed": 0, "verified": 0, "rejected": 0}
+
+
+async def _run(kind: str, fn, *args):
+    global _pending
+    if _pending >= PASSWORD_HASH_MAX_PENDING:
+        _stats["rejected"] += 1
+        raise PasswordPoolBusyError("Too many sign-in requests in progress. Please retry shortly.")
+    _pending += 1
+    t0 = time.perf_counter()
+    try:
+        return await asyncio.get_running_loop().run_in_executor(_executor, fn, *args)
+    finally:
+        _pending -= 1
+        _stats[kind] += 1
+        latencies.record(f"password.{kind}", (time.perf_counter() - t0) * 1000)
+
+
+async def hash_password_async(password: str) -> str:
+    return await _run("hashed", hash_password, password)
+
+
+async def verify_password_async(password: str, hashed: str) -> Tuple[bool, Optional[str]]:
+    """(valid, new_hash); new_hash is set when the stored hash should be upgraded."""
+    return await _run("verified", verify_and_update_password, password, hashed)
+
+
+def password_pool_stats() -> Dict[str, Any]:
+    return {
+        **_stats,
+        "workers": PASSWORD_HASH_WORKERS,
+        "in_flight": min(_pending, PASSWORD_HASH_WORKERS),
+        "queue_depth": max(0, _pending - PASSWORD_HASH_WORKERS),
+    }
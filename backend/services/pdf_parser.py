@@ -1,17 +1,23 @@
 import os
-import io
+import re
+import time
+import random
+import tempfile
+import threading
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor, TimeoutError as FuturesTimeout
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
 import fitz  # PyMuPDF
-import google.generativeai as genai
-from PIL import Image
 import pytesseract
-from config import GEMINI_API_KEY
+from config import (
+    PDF_WORKERS, OCR_PAGE_TIMEOUT, OCR_SCALE,
+    GEMINI_MODEL_NAME, GEMINI_PAGES_PER_REQUEST, GEMINI_CONCURRENCY, GEMINI_RPM, GEMINI_MAX_RETRIES, GEMINI_BACKOFF_BASE,
+)
+from services.registry import get_gemini_model  # multimodal Gemini, None without an API key
 
-# Configure Gemini
-if GEMINI_API_KEY:
-    genai.configure(api_key=GEMINI_API_KEY)
-    gemini_model = genai.GenerativeModel("gemini-2.0-flash")  # Multimodal model
-else:
-    gemini_model = None
+# Bump when extraction output changes so cached extractions are not reused
+EXTRACTOR_VERSION = f"2:{GEMINI_MODEL_NAME}"
 
 # Configure Tesseract path on Windows if provided
 TESSERACT_CMD = os.getenv("TESSERACT_CMD")
@@ -19,60 +25,258 @@ if TESSERACT_CMD:
     pytesseract.pytesseract.tesseract_cmd = TESSERACT_CMD
 
 
-def _ocr_page(page, scale: float = 2.0, lang: str = "eng") -> str:
-    """Render a PDF page to an image and run Tesseract OCR."""
+def _ocr_page(page, scale: float = OCR_SCALE, lang: str = "eng", timeout: float = OCR_PAGE_TIMEOUT) -> str:
+    """
+    Render a PDF page and run Tesseract OCR.
+    The grayscale pixmap is written as uncompressed PNM and handed to Tesseract by path,
+    skipping the PNG encode and the PIL decode/re-encode round-trip.
+    """
+    path = None
     try:
         mat = fitz.Matrix(scale, scale)
-        pix = page.get_pixmap(matrix=mat, alpha=False)
-        img_bytes = pix.tobytes("png")
-        with Image.open(io.BytesIO(img_bytes)) as im:
-            text = pytesseract.image_to_string(im, lang=lang)
-            return (text or "").strip()
+        pix = page.get_pixmap(matrix=mat, colorspace=fitz.csGRAY, alpha=False)
+        fd, path = tempfile.mkstemp(suffix=".pgm", prefix="ocr_")
+        os.close(fd)
+        pix.save(path)
+        text = pytesseract.image_to_string(path, lang=lang, timeout=timeout)
+        return (text or "").strip()
     except Exception:
         return ""
+    finally:
+        if path:
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+
+
+def _needs_ocr(page_text: str) -> bool:
+    # Heuristic: low text density -> probably a scanned page
+    alpha_chars = sum(ch.isalpha() for ch in page_text)
+    return len(page_text) < 40 or (len(page_text) > 0 and alpha_chars / max(1, len(page_text)) < 0.25)
+
+
+# =========================
+# Parallel page extraction
+# =========================
+# Each worker process opens the document itself and keeps it open for the pages it is handed.
+# The key includes the file's identity (inode, mtime, size): a PDF re-uploaded under the same
+# name is a new file (os.replace), and must not be read through the old open document.
+FileKey = Tuple[str, int, int, int]
+_worker_doc: Dict[FileKey, "fitz.Document"] = {}
+
+def _file_key(file_path: str) -> FileKey:
+    st = os.stat(file_path)
+    return file_path, st.st_ino, st.st_mtime_ns, st.st_size
+
+def _worker_open(key: FileKey):
+    doc = _worker_doc.get(key)
+    if doc is None:
+        for old in _worker_doc.values():
+            old.close()
+        _worker_doc.clear()
+        doc = fitz.open(key[0])
+        _worker_doc[key] = doc
+    return doc
+
+
+def _extract_page(key: FileKey, page_index: int) -> Tuple[int, str, str]:
+    """Runs in a pool worker. Returns (page_number, text, source_type)."""
+    page = _worker_open(key)[page_index]
+    page_text = (page.get_text("text") or "").strip()
+    if _needs_ocr(page_text):
+        ocr_txt = _ocr_page(page)
+        if ocr_txt:
+            return page_index + 1, ocr_txt, "ocr"
+    return page_index + 1, page_text, "pdf"
+
+
+_pool: Optional[ProcessPoolExecutor] = None
+
+def _get_pool() -> ProcessPoolExecutor:
+    global _pool
+    if _pool is None:
+        # spawn: the app process holds threads (model, HTTP clients), which fork does not handle safely
+        _pool = ProcessPoolExecutor(max_workers=PDF_WORKERS, mp_context=multiprocessing.get_context("spawn"))
+    return _pool
+
+
+def shutdown_pool():
+    global _pool
+    if _pool is not None:
+        _pool.shutdown(wait=False, cancel_futures=True)
+        _pool = None
+
+
+def iter_pages(file_path: str) -> Iterator[Tuple[int, str, str]]:
+    """
+    Native text + OCR for every page, fanned out over the process pool.
+    Yields (page_number, text, source_type) in page order as results arrive.
+    A page that exceeds OCR_PAGE_TIMEOUT yields empty text instead of stalling the document.
+    """
+    key = _file_key(file_path)
+    with fitz.open(file_path) as doc:
+        page_count = doc.page_count
+    if page_count == 0:
+        return
+    pool = _get_pool()
+    window = max(1, PDF_WORKERS * 4)   # bound pending results in memory
+    futures = {}
+    next_submit = 0
+    for idx in range(page_count):
+        while next_submit < page_count and next_submit < idx + window:
+            futures[next_submit] = pool.submit(_extract_page, key, next_submit)
+            next_submit += 1
+        fut = futures.pop(idx)
+        try:
+            # Tesseract gets its own timeout; this one also covers rendering and queueing
+            yield fut.result(timeout=OCR_PAGE_TIMEOUT * 2)
+        except FuturesTimeout:
+            fut.cancel()
+            print(f"⚠️ Page {idx + 1} of {file_path} timed out during extraction.")
+            yield idx + 1, "", "pdf"
+        except Exception as e:
+            print(f"⚠️ Page {idx + 1} of {file_path} failed: {e}")
+            yield idx + 1, "", "pdf"
+
+
+# =========================
+# Gemini page-range extraction
+# =========================
+_PAGE_MARKER = re.compile(r"^\s*=+\s*page\s+(\d+)\s*=+\s*$", re.IGNORECASE | re.MULTILINE)
+
+
+class _RateLimiter:
+    """Spaces request starts so at most `per_minute` Gemini calls begin per minute (thread-safe)."""
+
+    def __init__(self, per_minute: float):
+        self._interval = 60.0 / per_minute if per_minute > 0 else 0.0
+        self._lock = threading.Lock()
+        self._next = 0.0
+
+    def wait(self):
+        with self._lock:
+            now = time.monotonic()
+            start = max(now, self._next)
+            self._next = start + self._interval
+        if start > now:
+            time.sleep(start - now)
+
+
+_gemini_limiter = _RateLimiter(GEMINI_RPM)
+
+
+def _page_ranges(page_indexes: List[int], max_pages: int) -> List[List[int]]:
+    """Group sorted page indexes into runs of consecutive pages, at most max_pages long."""
+    ranges: List[List[int]] = []
+    for idx in page_indexes:
+        if ranges and idx == ranges[-1][-1] + 1 and len(ranges[-1]) < max_pages:
+            ranges[-1].append(idx)
+        else:
+            ranges.append([idx])
+    return ranges
+
+
+def _gemini_extract_range(gemini_model, file_path: str, pages: List[int]) -> Dict[int, str]:
+    """
+    Send one page range as its own small PDF and parse the per-page reply.
+    Retries with exponential backoff; returns {page_index: text} for the pages found.
+    """
+    with fitz.open(file_path) as doc, fitz.open() as sub:
+        sub.insert_pdf(doc, from_page=pages[0], to_page=pages[-1])
+        pdf_bytes = sub.tobytes()
+
+    prompt = (
+        f"This PDF has {len(pages)} page(s). Extract all visible text from every page. "
+        "Start each page with a line '=== Page N ===' where N is the page number within this PDF "
+        "(starting at 1), followed by that page's plain text."
+    )
+    last_error = None
+    for attempt in range(GEMINI_MAX_RETRIES + 1):
+        if attempt:
+            time.sleep(min(30.0, GEMINI_BACKOFF_BASE * (2 ** (attempt - 1))) * (0.5 + random.random()))
+        _gemini_limiter.wait()
+        try:
+            response = gemini_model.generate_content([{"mime_type": "application/pdf", "data": pdf_bytes}, prompt])
+            text = response.text or ""
+        except Exception as e:
+            last_error = e
+            continue
+
+        found: Dict[int, str] = {}
+        markers = list(_PAGE_MARKER.finditer(text))
+        for i, m in enumerate(markers):
+            rel = int(m.group(1))
+            end = markers[i + 1].start() if i + 1 < len(markers) else len(text)
+            if 1 <= rel <= len(pages):
+                found[pages[rel - 1]] = text[m.end():end].strip()
+        if not markers and len(pages) == 1 and text.strip():
+            found[pages[0]] = text.strip()
+        if found:
+            return found
+        last_error = ValueError("no page markers in Gemini reply")
+    print(f"⚠️ Gemini extraction failed for pages {pages[0] + 1}-{pages[-1] + 1}: {last_error}")
+    return {}
+
+
+def _extract_pages(file_path: str) -> List[Dict[str, Any]]:
+    """
+    Page-wise extraction shared by the public helpers.
+    Pages whose native text is already dense are taken as-is. Without Gemini the rest go
+    through the OCR pool; with Gemini they are sent in page ranges, concurrently under a
+    rate limit, and any range that still fails falls back to OCR for its pages.
+    Returns: [{"page_number", "text", "source_type"}] in page order.
+    """
+    gemini_model = get_gemini_model()
+    if not gemini_model:
+        return [{"page_number": n, "text": t, "source_type": src} for n, t, src in iter_pages(file_path)]
+
+    with fitz.open(file_path) as doc:
+        native = [(page.get_text("text") or "").strip() for page in doc]
+
+    pages: Dict[int, Dict[str, Any]] = {}
+    sparse = []
+    for idx, txt in enumerate(native):
+        if _needs_ocr(txt):
+            sparse.append(idx)
+        else:
+            pages[idx] = {"page_number": idx + 1, "text": txt, "source_type": "pdf"}
+
+    failed: List[int] = []
+    if sparse:
+        ranges = _page_ranges(sparse, GEMINI_PAGES_PER_REQUEST)
+        with ThreadPoolExecutor(max_workers=GEMINI_CONCURRENCY, thread_name_prefix="gemini-extract") as pool:
+            futures = {pool.submit(_gemini_extract_range, gemini_model, file_path, r): r for r in ranges}
+            for fut, r in futures.items():
+                found = fut.result()
+                for idx in r:
+                    if found.get(idx):
+                        pages[idx] = {"page_number": idx + 1, "text": found[idx], "source_type": "ocr"}
+                    else:
+                        failed.append(idx)
+
+    if failed:
+        pool = _get_pool()
+        key = _file_key(file_path)
+        for idx, fut in [(i, pool.submit(_extract_page, key, i)) for i in failed]:
+            try:
+                num, txt, src = fut.result(timeout=OCR_PAGE_TIMEOUT * 2)
+            except Exception:
+                num, txt, src = idx + 1, native[idx], "pdf"
+            pages[idx] = {"page_number": num, "text": txt, "source_type": src}
+
+    return [pages[i] for i in sorted(pages)]
 
 
 def extract_text_from_pdf(file_path: str) -> str:
     """
     Extracts text from a PDF.
-    1. Try Gemini OCR (works on both scanned and digital PDFs).
-    2. Fallback: PyMuPDF text extraction.
+    1. Dense pages: PyMuPDF text.
+    2. Sparse pages: Gemini page ranges (OCR fallback), or Tesseract OCR without Gemini.
     """
     try:
-        if gemini_model:
-            with open(file_path, "rb") as f:
-                pdf_bytes = f.read()
-
-            response = gemini_model.generate_content(
-                [
-                    {
-                        "mime_type": "application/pdf",
-                        "data": pdf_bytes
-                    },
-                    "Extract all visible text from this PDF. Return plain text only."
-                ]
-            )
-            if response.text:
-                return response.text.strip()
-
-        # --- fallback to PyMuPDF and OCR if needed ---
-        doc = fitz.open(file_path)
-        parts = []
-        for page in doc:
-            page_text = page.get_text("text") or ""
-            # Heuristic: if low text density, try OCR
-            plain = page_text.strip()
-            alpha_chars = sum(ch.isalpha() for ch in plain)
-            if len(plain) < 40 or (len(plain) > 0 and alpha_chars / max(1, len(plain)) < 0.25):
-                ocr_txt = _ocr_page(page)
-                if ocr_txt:
-                    parts.append(ocr_txt)
-                else:
-                    parts.append(plain)
-            else:
-                parts.append(plain)
+        parts = [p["text"] for p in _extract_pages(file_path)]
         return "\n".join(p for p in parts if p).strip()
-
     except Exception as e:
         print(f"❌ Error extracting PDF with Gemini OCR: {e}")
         return ""
@@ -80,56 +284,11 @@ def extract_text_from_pdf(file_path: str) -> str:
 
 def extract_text_by_page(file_path: str):
     """
-    Extracts text page by page using Gemini OCR if available.
+    Extracts text page by page (Gemini for sparse pages if available).
     Returns: [(page_number, text), ...]
     """
-    results = []
     try:
-        if gemini_model:
-            with open(file_path, "rb") as f:
-                pdf_bytes = f.read()
-
-            response = gemini_model.generate_content(
-                [
-                    {
-                        "mime_type": "application/pdf",
-                        "data": pdf_bytes
-                    },
-                    "Extract text from this PDF page by page. Return output as:\nPage 1: ...\nPage 2: ..."
-                ]
-            )
-            if response.text:
-                # Simple parsing of Gemini output
-                lines = response.text.splitlines()
-                page_num = None
-                page_text = []
-                for line in lines:
-                    if line.lower().startswith("page "):
-                        if page_num and page_text:
-                            results.append((page_num, " ".join(page_text).strip()))
-                            page_text = []
-                        try:
-                            page_num = int(line.split()[1].replace(":", "").strip())
-                        except:
-                            page_num = None
-                    else:
-                        page_text.append(line)
-                if page_num and page_text:
-                    results.append((page_num, " ".join(page_text).strip()))
-                return results
-
-        # --- fallback: PyMuPDF text with OCR per page if needed ---
-        doc = fitz.open(file_path)
-        for page_num, page in enumerate(doc, start=1):
-            page_text = (page.get_text("text") or "").strip()
-            alpha_chars = sum(ch.isalpha() for ch in page_text)
-            needs_ocr = len(page_text) < 40 or (len(page_text) > 0 and alpha_chars / max(1, len(page_text)) < 0.25)
-            if needs_ocr:
-                ocr_txt = _ocr_page(page)
-                page_text = (ocr_txt or page_text).strip()
-            results.append((page_num, page_text))
-        return results
-
+        return [(p["page_number"], p["text"]) for p in _extract_pages(file_path)]
     except Exception as e:
         print(f"❌ Error extracting PDF (page-wise Gemini OCR): {e}")
         return []
@@ -137,33 +296,11 @@ def extract_text_by_page(file_path: str):
 
 def extract_text_by_page_with_meta(file_path: str):
     """
-    Like extract_text_by_page, but also returns whether a page likely required OCR.
+    Like extract_text_by_page, but also returns whether a page required OCR (Tesseract or Gemini).
     Returns: list of dicts: {"page_number": int, "text": str, "source_type": "pdf"|"ocr"}
     """
-    output = []
     try:
-        # Try Gemini first (no reliable per-page OCR flag), fallback mirrors above logic
-        if gemini_model:
-            # Defer to page-wise function and mark as 'pdf' (text extracted by model) for simplicity
-            pages = extract_text_by_page(file_path)
-            for num, txt in pages:
-                output.append({"page_number": num, "text": txt, "source_type": "pdf"})
-            return output
-
-        doc = fitz.open(file_path)
-        for page_num, page in enumerate(doc, start=1):
-            page_text = (page.get_text("text") or "").strip()
-            alpha_chars = sum(ch.isalpha() for ch in page_text)
-            needs_ocr = len(page_text) < 40 or (len(page_text) > 0 and alpha_chars / max(1, len(page_text)) < 0.25)
-            if needs_ocr:
-                ocr_txt = _ocr_page(page)
-                txt = (ocr_txt or page_text).strip()
-                src = "ocr" if ocr_txt else "pdf"
-            else:
-                txt = page_text
-                src = "pdf"
-            output.append({"page_number": page_num, "text": txt, "source_type": src})
-        return output
+        return _extract_pages(file_path)
     except Exception as e:
         print(f"❌ Error extracting PDF (page-wise with meta): {e}")
         return []
@@ -0,0 +1,73 @@
+import threading
+from collections import Counter, deque
+from contextvars import ContextVar
+from typing import Any, Deque, Dict, List, Optional
+
+
+class LatencyRecorder:
+    """Rolling window of per-stage latencies (ms, or another `unit`) with count and percentiles."""
+
+    def __init__(self, window: int = 1024, unit: str = "ms"):
+        self._window = window
+        self._unit = unit
+        self._samples: Dict[str, Deque[float]] = {}
+        self._counts: Dict[str, int] = {}
+        self._lock = threading.Lock()
+
+    def record(self, stage: str, value: float):
+        with self._lock:
+            if stage not in self._samples:
+                self._samples[stage] = deque(maxlen=self._window)
+                self._counts[stage] = 0
+            self._samples[stage].append(value)
+            self._counts[stage] += 1
+
+    def stats(self) -> Dict[str, Any]:
+        out: Dict[str, Any] = {}
+        with self._lock:
+            for stage, samples in self._samples.items():
+                ordered = sorted(samples)
+                n = len(ordered)
+
+                def pct(p: float) -> float:
+                    return round(ordered[min(n - 1, int(p * n))], 2)
+
+                u = self._unit
+                out[stage] = {"count": self._counts[stage], f"p50_{u}": pct(0.50), f"p95_{u}": pct(0.95), f"p99_{u}": pct(0.99)}
+        return out
+
+
+# Shared recorder for request-path stages (retrieval, rerank, generation, ...)
+latencies = LatencyRecorder()
+
+# Prompt sizes sent to the LLM (estimated tokens per section)
+prompt_sizes = LatencyRecorder(unit="tokens")
+
+# =========================
+# Qdrant calls per request
+# =========================
+# The request middleware installs a fresh counter; the registry's client wrapper bumps it.
+# Calls outside a request (ingestion workers, warm-up) only show up in the totals.
+_request_qdrant_calls: ContextVar[Optional[List[int]]] = ContextVar("request_qdrant_calls", default=None)
+qdrant_calls_per_request = LatencyRecorder(unit="calls")
+_qdrant_call_totals: Counter = Counter()
+
+
+def begin_request_qdrant_count() -> List[int]:
+    box = [0]
+    _request_qdrant_calls.set(box)
+    return box
+
+
+def count_qdrant_call(method: str):
+    _qdrant_call_totals[method] += 1
+    box = _request_qdrant_calls.get()
+    if box is not None:
+        box[0] += 1
+
+
+def qdrant_call_stats() -> Dict[str, Any]:
+    return {
+        "per_request": qdrant_calls_per_request.stats(),
+        "totals": dict(_qdrant_call_totals),
+    }
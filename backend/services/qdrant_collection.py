@@ -0,0 +1,335 @@
+"""
+Qdrant collection layout and lifecycle.
+
+Two aliases point at a physical collection named "<QDRANT_COLLECTION>_<timestamp>":
+QDRANT_COLLECTION for reads and WRITE_COLLECTION for upserts. Normally both point
+at the same collection. A migration moves the write alias to the new collection
+first, backfills it, then moves the read alias; resets swap both at once. Searches
+never hit a missing or half-built collection and no writes are lost meanwhile.
+A pre-alias deployment (a real collection named QDRANT_COLLECTION) keeps working
+and is converted on its first reset or migration.
+"""
+import os
+import threading
+import time
+from contextlib import contextmanager
+from typing import Any, Dict, List, Optional
+
+from qdrant_client.http import models as qmodels
+from config import (
+    EMBEDDING_DIM, HYBRID_SEARCH_ENABLED,
+    QDRANT_QUANTIZATION, QDRANT_QUANTIZATION_RESCORE, QDRANT_QUANTIZATION_OVERSAMPLING,
+    QDRANT_VECTORS_ON_DISK, QDRANT_HNSW_M, QDRANT_HNSW_EF_CONSTRUCT, QDRANT_SEARCH_EF,
+    QDRANT_REVALIDATE_SECONDS,
+)
+from services import sparse_encoder
+from services.registry import get_qdrant
+
+QDRANT_COLLECTION = os.getenv("QDRANT_COLLECTION", "techsupport_chunks")
+WRITE_COLLECTION = f"{QDRANT_COLLECTION}_write"
+SPARSE_VECTOR_NAME = "text-sparse"   # BM25-style lexical vector next to the default dense vector
+
+# Bump when the layout or payload indexes change in a way live collections must be re-checked for
+SCHEMA_VERSION = 2
+
+# Cached result of the last successful validation. While fresh, ensure_collection() makes no
+# Qdrant calls; it is cleared after /reset, alias swaps and any failed Qdrant operation, and
+# expires after QDRANT_REVALIDATE_SECONDS so changes made by other processes are picked up.
+_known_good: Optional[Dict[str, Any]] = None
+_state_lock = threading.Lock()
+
+
+# =========================
+# Layout (from config)
+# =========================
+def _quantization_config():
+    if QDRANT_QUANTIZATION == "scalar":
+        return qmodels.ScalarQuantization(scalar=qmodels.ScalarQuantizationConfig(
+            type=qmodels.ScalarType.INT8, quantile=0.99, always_ram=True,
+        ))
+    if QDRANT_QUANTIZATION == "binary":
+        return qmodels.BinaryQuantization(binary=qmodels.BinaryQuantizationConfig(always_ram=True))
+    if QDRANT_QUANTIZATION not in ("", "none"):
+        raise ValueError(f"Unknown QDRANT_QUANTIZATION: {QDRANT_QUANTIZATION}")
+    return None
+
+
+def _collection_kwargs() -> Dict[str, Any]:
+    return {
+        # With quantization the int8/binary copy stays in RAM and originals can live on disk for rescoring
+        "vectors_config": qmodels.VectorParams(
+            size=EMBEDDING_DIM, distance=qmodels.Distance.COSINE, on_disk=QDRANT_VECTORS_ON_DISK,
+        ),
+        "sparse_vectors_config": {SPARSE_VECTOR_NAME: qmodels.SparseVectorParams(modifier=qmodels.Modifier.IDF)},
+        "hnsw_config": qmodels.HnswConfigDiff(m=QDRANT_HNSW_M, ef_construct=QDRANT_HNSW_EF_CONSTRUCT),
+        "quantization_config": _quantization_config(),
+    }
+
+
+def _build_search_params() -> Optional[qmodels.SearchParams]:
+    quantization = None
+    if QDRANT_QUANTIZATION in ("scalar", "binary"):
+        quantization = qmodels.QuantizationSearchParams(
+            rescore=QDRANT_QUANTIZATION_RESCORE,
+            oversampling=QDRANT_QUANTIZATION_OVERSAMPLING,
+        )
+    if not QDRANT_SEARCH_EF and quantization is None:
+        return None
+    return qmodels.SearchParams(hnsw_ef=QDRANT_SEARCH_EF or None, quantization=quantization)
+
+
+_search_params = _build_search_params()
+
+
+def dense_search_params() -> Optional[qmodels.SearchParams]:
+    """Per-query HNSW ef and quantization rescoring for dense searches (None = server defaults)."""
+    return _search_params
+
+
+# =========================
+# Alias resolution
+# =========================
+def _aliases() -> Dict[str, str]:
+    return {a.alias_name: a.collection_name for a in get_qdrant().get_aliases().aliases}
+
+
+def _live_target(aliases: Optional[Dict[str, str]] = None) -> Optional[str]:
+    """Physical collection behind QDRANT_COLLECTION: the alias target, a legacy same-name collection, or None."""
+    aliases = _aliases() if aliases is None else aliases
+    if QDRANT_COLLECTION in aliases:
+        return aliases[QDRANT_COLLECTION]
+    if QDRANT_COLLECTION in {c.name for c in get_qdrant().get_collections().collections}:
+        return QDRANT_COLLECTION
+    return None
+
+
+def _create_physical() -> str:
+    now = time.time()
+    name = f"{QDRANT_COLLECTION}_{time.strftime('%Y%m%d%H%M%S', time.gmtime(now))}{int(now * 1000) % 1000:03d}"
+    qdrant = get_qdrant()
+    qdrant.create_collection(collection_name=name, **_collection_kwargs())
+    qdrant.create_payload_index(
+        collection_name=name,
+        field_name="metadata.domain",
+        field_schema=qmodels.PayloadSchemaType.KEYWORD,
+    )
+    return name
+
+
+def _point_aliases(read_target: Optional[str] = None, write_target: Optional[str] = None):
+    """Atomically (re)point the read and/or write alias. The read alias name must not be a real collection."""
+    aliases = _aliases()
+    ops: List[Any] = []
+    for alias, target in ((QDRANT_COLLECTION, read_target), (WRITE_COLLECTION, write_target)):
+        if target is None:
+            continue
+        if alias in aliases:
+            ops.append(qmodels.DeleteAliasOperation(delete_alias=qmodels.DeleteAlias(alias_name=alias)))
+        ops.append(qmodels.CreateAliasOperation(
+            create_alias=qmodels.CreateAlias(collection_name=target, alias_name=alias),
+        ))
+    get_qdrant().update_collection_aliases(change_aliases_operations=ops)
+    invalidate_collection_state()
+
+
+def _swap_alias(new_name: str) -> Optional[str]:
+    """Point both aliases at `new_name`. Returns the previous physical collection, if it still exists."""
+    old = _live_target()
+    if old == QDRANT_COLLECTION:
+        # Pre-alias layout: the name is taken by a real collection, so it has to go first.
+        # Only used when its contents are being discarded (reset); migrations backfill first.
+        get_qdrant().delete_collection(QDRANT_COLLECTION)
+        old = None
+    _point_aliases(new_name, new_name)
+    return old
+
+
+# =========================
+# Lifecycle
+# =========================
+def _validate() -> Dict[str, Any]:
+    """Create the collection/aliases if missing, check the layout and payload index."""
+    aliases = _aliases()
+    target = _live_target(aliases)
+    if target is None:
+        target = _create_physical()
+        _point_aliases(target, target)
+        write_target = target
+    else:
+        write_target = aliases.get(WRITE_COLLECTION)
+        if write_target is None:
+            # Deployments from before the write alias: writes follow reads
+            _point_aliases(write_target=target)
+            write_target = target
+    qdrant = get_qdrant()
+    info = qdrant.get_collection(QDRANT_COLLECTION)
+    if "metadata.domain" not in (info.payload_schema or {}):
+        qdrant.create_payload_index(
+            collection_name=QDRANT_COLLECTION,
+            field_name="metadata.domain",
+            field_schema=qmodels.PayloadSchemaType.KEYWORD,
+        )
+    write_info = info if write_target == target else qdrant.get_collection(WRITE_COLLECTION)
+    has_sparse = SPARSE_VECTOR_NAME in (info.config.params.sparse_vectors or {})
+    if not has_sparse:
+        print(f"⚠️ Collection {target} has no sparse vector; run scripts/migrate_collection.py for hybrid search.")
+    return {
+        "schema_version": SCHEMA_VERSION,
+        "target": target,
+        "write_target": write_target,
+        "has_sparse": has_sparse,
+        "write_has_sparse": SPARSE_VECTOR_NAME in (write_info.config.params.sparse_vectors or {}),
+        "validated_at": time.time(),
+    }
+
+
+def collection_ready() -> bool:
+    state = _known_good
+    return (
+        state is not None
+        and state["schema_version"] == SCHEMA_VERSION
+        and time.time() - state["validated_at"] < QDRANT_REVALIDATE_SECONDS
+    )
+
+
+def ensure_collection():
+    """Bootstrap; a no-op (no Qdrant calls) while the cached state is known-good and fresh."""
+    global _known_good
+    if collection_ready():
+        return
+    with _state_lock:
+        if not collection_ready():
+            _known_good = _validate()
+
+
+def invalidate_collection_state():
+    global _known_good
+    _known_good = None
+
+
+@contextmanager
+def revalidate_on_error():
+    """Any failed Qdrant operation (e.g. collection dropped elsewhere) forces re-validation next time."""
+    try:
+        yield
+    except Exception:
+        invalidate_collection_state()
+        raise
+
+
+def collection_state() -> Dict[str, Any]:
+    return dict(_known_good) if _known_good else {"schema_version": SCHEMA_VERSION, "validated": False}
+
+
+def recreate_collection():
+    """Empty the collection under the current layout: build a fresh one, swap both aliases, drop the old one."""
+    old = _swap_alias(_create_physical())
+    if old:
+        get_qdrant().delete_collection(old)
+    ensure_collection()
+
+
+def hybrid_available() -> bool:
+    """Collections created before hybrid search have no sparse vector until /reset or migration."""
+    if not HYBRID_SEARCH_ENABLED:
+        return False
+    ensure_collection()
+    return bool((_known_good or {}).get("has_sparse"))
+
+
+def write_sparse_available() -> bool:
+    """Whether upserts should carry the sparse vector (the write target can differ mid-migration)."""
+    ensure_collection()
+    return bool((_known_good or {}).get("write_has_sparse"))
+
+
+# =========================
+# Migration (rebuild under the current layout)
+# =========================
+def _to_point(record) -> qmodels.PointStruct:
+    vector = record.vector
+    if isinstance(vector, dict):
+        dense = vector.get("")
+        sparse = vector.get(SPARSE_VECTOR_NAME)
+    else:
+        dense, sparse = vector, None
+    if sparse is None:
+        # Source predates hybrid search: derive the lexical vector from the stored text
+        indices, values = sparse_encoder.encode_document((record.payload or {}).get("text", ""))
+        sparse = qmodels.SparseVector(indices=indices, values=values)
+    return qmodels.PointStruct(id=record.id, vector={"": dense, SPARSE_VECTOR_NAME: sparse}, payload=record.payload)
+
+
+def _backfill(source: str, target: str, batch_size: int) -> Dict[str, int]:
+    """
+    Copy points missing from `target`; points the app already wrote there (newer) are left alone.
+    App deletes go through both aliases, so the only way a copy can resurrect a deleted point is
+    a delete landing between our scroll and upsert: after each batch, ids gone from the source
+    are removed from the target again.
+    """
+    qdrant = get_qdrant()
+    copied = pruned = 0
+    offset = None
+    while True:
+        records, offset = qdrant.scroll(
+            collection_name=source, limit=batch_size, offset=offset,
+            with_payload=True, with_vectors=True,
+        )
+        if records:
+            present = {str(p.id) for p in qdrant.retrieve(
+                collection_name=target, ids=[r.id for r in records], with_payload=False, with_vectors=False,
+            )}
+            records = [r for r in records if str(r.id) not in present]
+        if records:
+            ids = [r.id for r in records]
+            qdrant.upsert(collection_name=target, points=[_to_point(r) for r in records], wait=True)
+            still = {str(p.id) for p in qdrant.retrieve(
+                collection_name=source, ids=ids, with_payload=False, with_vectors=False,
+            )}
+            gone = [pid for pid in ids if str(pid) not in still]
+            if gone:
+                qdrant.delete(collection_name=target, points_selector=qmodels.PointIdsList(points=gone), wait=True)
+            copied += len(ids) - len(gone)
+            pruned += len(gone)
+        if offset is None:
+            return {"copied": copied, "pruned": pruned}
+
+
+def migrate_collection(batch_size: int = 256) -> Dict[str, Any]:
+    """
+    Rebuild the live collection under the current layout (quantization, on-disk vectors,
+    HNSW params, sparse vector) without downtime or lost writes:
+    1. create the new collection and point the write alias at it, so new and updated
+       points land there while searches keep using the old one;
+    2. backfill the points missing from it (deletes meanwhile hit both collections);
+    3. point the read alias at it and drop the old collection.
+    """
+    t0 = time.perf_counter()
+    source = _live_target()
+    if source is None:
+        ensure_collection()
+        return {"source": None, "target": _live_target(), "copied": 0, "pruned": 0}
+
+    qdrant = get_qdrant()
+    target = _create_physical()
+    _point_aliases(write_target=target)
+    if SPARSE_VECTOR_NAME not in (qdrant.get_collection(source).config.params.sparse_vectors or {}):
+        # Running apps decide whether upserts carry sparse vectors from their cached layout;
+        # wait until they have all re-read it so nothing lands in the target dense-only.
+        time.sleep(QDRANT_REVALIDATE_SECONDS + 1)
+
+    counts = _backfill(source, target, batch_size)
+
+    if source == QDRANT_COLLECTION:
+        # Pre-alias layout: the name has to be freed for the read alias. Writes already go
+        # to the target, so nothing is lost; searches fail only until the alias exists.
+        qdrant.delete_collection(source)
+    _point_aliases(read_target=target)
+    if source != QDRANT_COLLECTION:
+        qdrant.delete_collection(source)
+    return {
+        "source": source,
+        "target": target,
+        **counts,
+        "elapsed_s": round(time.perf_counter() - t0, 1),
+    }
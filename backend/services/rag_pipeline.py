@@ -1,15 +1,11 @@
-import google.generativeai as genai
-from services.embedder import embed_query_and_search
-from config import GEMINI_API_KEY
+import anyio
+from services.async_utils import iterate_in_thread
+from services.embedder import embed_query_and_search_async
+from services.registry import get_gemini_model
+from services.perf_metrics import prompt_sizes
+from config import PROMPT_TOKEN_BUDGET, PROMPT_MIN_CONTEXT_TOKENS, HISTORY_TOKEN_BUDGET, HISTORY_ANSWER_MAX_TOKENS
 import re
-from typing import List, Dict, Any, Optional
-
-# Configure Gemini
-if GEMINI_API_KEY:
-    genai.configure(api_key=GEMINI_API_KEY)
-    generation_model = genai.GenerativeModel("gemini-2.0-flash")
-else:
-    generation_model = None
+from typing import List, Dict, Any, Optional, Tuple
 
 # =========================
 # System Prompt
@@ -53,44 +49,128 @@ def analyze_question(question: str) -> dict:
         "requires_context": depth > 2  # Deeper questions likely need more context
     }
 
+# Openers and references that only make sense against the previous turns
+_FOLLOW_UP_START = re.compile(r"^(?:and|but|also|so|then|ok(?:ay)?|what about|how about|why not)\b")
+_FOLLOW_UP_REFERENCE = re.compile(
+    r"\b(?:it|its|that|this|these|those|they|them|above|previous|earlier|again|instead|you said|you mentioned)\b"
+)
+
+def is_follow_up(question: str) -> bool:
+    """Heuristic: does the question lean on the conversation so far (so history belongs in the prompt)?"""
+    q = question.lower().strip()
+    return len(q.split()) <= 3 or bool(_FOLLOW_UP_START.match(q) or _FOLLOW_UP_REFERENCE.search(q))
+
 # =========================
-# Build RAG Prompt
+# Context Packing
 # =========================
-def build_rag_prompt(chunks_with_meta: List[Dict[str, Any]], user_query: str, chat_history: Optional[List] = None) -> str:
-    """Build a prompt for the LLM with context and chat history."""
-    # Analyze the question
-    q_analysis = analyze_question(user_query)
-    
-    # Prepare context with sources
-    context_parts = []
+_CHARS_PER_TOKEN = 4
+
+def estimate_tokens(text: str) -> int:
+    """Cheap prompt-size estimate (~4 characters per token); no tokenizer round trip."""
+    return (len(text or "") + _CHARS_PER_TOKEN - 1) // _CHARS_PER_TOKEN
+
+def _truncate_to_tokens(text: str, max_tokens: int) -> str:
+    """Cut at the last sentence (or word) boundary inside the budget."""
+    limit = max_tokens * _CHARS_PER_TOKEN
+    if len(text) <= limit:
+        return text
+    cut = text[:limit]
+    end = max(cut.rfind(". "), cut.rfind("! "), cut.rfind("? "))
+    if end >= limit // 2:
+        return cut[:end + 1] + " …"
+    return cut.rsplit(" ", 1)[0] + " …"
+
+def _merge_overlap(a: str, b: str) -> Optional[str]:
+    """
+    Join two chunks from the same page when one contains the other or b starts with
+    a's tail (the chunker's sentence overlap). Returns None when they don't overlap.
+    """
+    if b in a:
+        return a
+    if a in b:
+        return b
+    probe = b[:20]  # shorter than the chunker's overlap, long enough to avoid chance matches
+    idx = a.find(probe)
+    while idx != -1:
+        if b.startswith(a[idx:]):
+            return a + b[len(a) - idx:]
+        idx = a.find(probe, idx + 1)
+    return None
+
+def _source_ref(meta: Dict[str, Any]) -> str:
+    source = meta.get("pdf_name", meta.get("source", "Document"))
+    page = meta.get("page_number")
+    return f"({source}, Page {page})" if page else f"({source})"
+
+def pack_context(chunks_with_meta: List[Dict[str, Any]], budget_tokens: int) -> Tuple[str, Dict[str, int]]:
+    """
+    Pack retrieved chunks into at most `budget_tokens`:
+    - chunks from the same source page become one block (one source reference),
+      with overlapping / duplicate text merged away;
+    - blocks keep the rank of their best chunk and are added best first;
+    - the block that crosses the budget is truncated, the rest are dropped.
+    """
+    blocks: Dict[str, Dict[str, Any]] = {}
+    merged = 0
     for chunk in chunks_with_meta:
         text = chunk.get("text", "").strip()
-        meta = chunk.get("metadata", {})
-        source = meta.get("pdf_name", meta.get("source", "Document"))
-        page = meta.get("page_number")
-        
-        # Format the source reference
-        source_ref = f"({source}, Page {page})" if page else f"({source})"
-        
-        # Add the source reference to the text
-        if text and not text.endswith(source_ref):
-            text = f"{text} {source_ref}"
-            
-        context_parts.append(text)
-    
-    # Prepare chat history if available
-    history_section = ""
-    if chat_history:
-        history_turns = []
-        for h in chat_history[-4:]:  # Last 4 exchanges
-            q = h.get("query", h.get("question", ""))
-            a = h.get("answer", "")
-            history_turns.append(f"User: {q}\nAssistant: {a}")
-        if history_turns:
-            history_section = "\n\nConversation History:\n" + "\n\n".join(history_turns)
-    
-    # Build the final prompt
-    context = "\n\n".join(context_parts)
+        if not text:
+            continue
+        ref = _source_ref(chunk.get("metadata", {}))
+        block = blocks.get(ref)
+        if block is None:
+            blocks[ref] = {"ref": ref, "parts": [text]}
+            continue
+        merged += 1
+        for i, part in enumerate(block["parts"]):
+            joined = _merge_overlap(part, text) or _merge_overlap(text, part)
+            if joined is not None:
+                block["parts"][i] = joined
+                break
+        else:
+            block["parts"].append(text)
+
+    parts: List[str] = []
+    used, dropped = 0, 0
+    for block in blocks.values():
+        body = " ".join(block["parts"])
+        entry = f"{body} {block['ref']}"
+        cost = estimate_tokens(entry) + 1
+        if used + cost > budget_tokens:
+            room = budget_tokens - used - estimate_tokens(block["ref"]) - 2
+            if room < 40:  # not worth a fragment
+                dropped += 1
+                continue
+            entry = f"{_truncate_to_tokens(body, room)} {block['ref']}"
+            cost = estimate_tokens(entry) + 1
+        parts.append(entry)
+        used += cost
+    return "\n\n".join(parts), {"chunks_in": len(chunks_with_meta), "chunks_merged": merged,
+                                  "blocks": len(parts), "blocks_dropped": dropped}
+
+def pack_history(chat_history: Optional[List], budget_tokens: int) -> str:
+    """Last 4 exchanges, long answers truncated, oldest turns dropped first to fit the budget."""
+    if not chat_history:
+        return ""
+    turns: List[str] = []
+    used = 0
+    for h in reversed(chat_history[-4:]):
+        q = h.get("query", h.get("question", ""))
+        a = _truncate_to_tokens(h.get("answer", ""), HISTORY_ANSWER_MAX_TOKENS)
+        turn = f"User: {q}\nAssistant: {a}"
+        cost = estimate_tokens(turn) + 1
+        if used + cost > budget_tokens:
+            break
+        turns.insert(0, turn)
+        used += cost
+    if not turns:
+        return ""
+    return "\n\nConversation History:\n" + "\n\n".join(turns)
+
+# =========================
+# Build RAG Prompt
+# =========================
+def _render_prompt(q_analysis: dict, context: str, user_query: str, history_section: str) -> str:
     return f"""{SYSTEM_PROMPT}
 
 Question Analysis:
@@ -111,6 +191,43 @@ Instructions:
 3. The context includes source references in the format (filename, Page X)
 4. Be concise but thorough based on the question's depth"""
 
+def pack_rag_prompt(chunks_with_meta: List[Dict[str, Any]], user_query: str, chat_history: Optional[List] = None,
+                    budget_tokens: int = PROMPT_TOKEN_BUDGET) -> Tuple[str, Dict[str, int]]:
+    """
+    Build the prompt within `budget_tokens` (estimated). Fixed parts and the question come
+    first, then history (up to HISTORY_TOKEN_BUDGET), and the context gets the rest, never
+    less than PROMPT_MIN_CONTEXT_TOKENS: a longer question (e.g. a pasted log) is truncated.
+    Returns (prompt, stats) where stats carries the final token counts.
+    """
+    q_analysis = analyze_question(user_query)
+
+    min_context = min(PROMPT_MIN_CONTEXT_TOKENS, budget_tokens)
+    template = estimate_tokens(_render_prompt(q_analysis, "", "", ""))
+    question_room = max(0, budget_tokens - min_context - template)
+    question_truncated = estimate_tokens(user_query) > question_room
+    if question_truncated:
+        user_query = _truncate_to_tokens(user_query, question_room)
+
+    fixed = estimate_tokens(_render_prompt(q_analysis, "", user_query, ""))
+    history_section = pack_history(chat_history, min(HISTORY_TOKEN_BUDGET, max(0, budget_tokens - fixed - min_context)))
+    history_tokens = estimate_tokens(history_section)
+    context, stats = pack_context(chunks_with_meta, max(0, budget_tokens - fixed - history_tokens))
+
+    prompt = _render_prompt(q_analysis, context, user_query, history_section)
+    stats.update({
+        "prompt_tokens": estimate_tokens(prompt),
+        "context_tokens": estimate_tokens(context),
+        "history_tokens": history_tokens,
+        "question_truncated": int(question_truncated),
+    })
+    for key in ("prompt_tokens", "context_tokens", "history_tokens"):
+        prompt_sizes.record(key, stats[key])
+    return prompt, stats
+
+def build_rag_prompt(chunks_with_meta: List[Dict[str, Any]], user_query: str, chat_history: Optional[List] = None) -> str:
+    """Build a prompt for the LLM with context and chat history (within PROMPT_TOKEN_BUDGET)."""
+    return pack_rag_prompt(chunks_with_meta, user_query, chat_history)[0]
+
 # =========================
 # Main Answer Function
 # =========================
@@ -127,18 +244,19 @@ async def answer_query(user_query: str, score_threshold: float = 0.6, chat_histo
         
         # Step 2: Retrieve relevant context with dynamic k based on question depth
         k = min(10, 3 + q_analysis['depth'] * 2)  # More context for deeper questions
-        chunks_with_meta = embed_query_and_search(
+        chunks_with_meta = await embed_query_and_search_async(
             user_query, 
             k=k,
             score_threshold=min(score_threshold, 0.3)
         )
 
         # Step 3: Build and send prompt to LLM
+        generation_model = get_gemini_model()
         if generation_model is None:
             return "Error: Model not configured. Please set GEMINI_API_KEY."
             
         prompt = build_rag_prompt(chunks_with_meta, user_query, chat_history)
-        response = generation_model.generate_content(prompt)
+        response = await anyio.to_thread.run_sync(generation_model.generate_content, prompt)
         
         return (response.text or "I don't have enough information to answer that question.").strip()
 
@@ -149,14 +267,20 @@ async def answer_query(user_query: str, score_threshold: float = 0.6, chat_histo
 # Streaming Answer
 # =========================
 async def generate_answer_stream(prompt: str):
-    """Generate a streaming response from the LLM."""
+    """
+    Generate a streaming response from the LLM.
+    The blocking Gemini stream is consumed on a worker thread so other streams keep flowing.
+    """
     try:
+        generation_model = get_gemini_model()
         if generation_model is None:
             yield "Error: Model not configured. Please set GEMINI_API_KEY."
             return
             
-        response = generation_model.generate_content(prompt, stream=True)
-        for chunk in response:
+        def open_stream():
+            return generation_model.generate_content(prompt, stream=True)
+
+        async for chunk in iterate_in_thread(open_stream):
             if hasattr(chunk, 'text') and chunk.text:
                 yield chunk.text
     except Exception as e:
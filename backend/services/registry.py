@@ -0,0 +1,190 @@
+"""
+Shared, lazily-created models and clients.
+
+Nothing heavy happens at import time: the embedding model, Qdrant clients and
+Gemini models are built on first use (or by `warm_up()` in the background at
+startup) and then reused by every module.
+"""
+import os
+import threading
+import time
+from typing import Any, Dict, Optional
+
+from config import (
+    GEMINI_API_KEY, EMBEDDING_MODEL_NAME, GEMINI_MODEL_NAME,
+    EMBEDDING_BACKEND, EMBEDDING_ONNX_DIR, EMBEDDING_THREADS,
+    RERANK_ENABLED, RERANK_MODEL_NAME, RERANK_THREADS,
+)
+from services.perf_metrics import count_qdrant_call
+
+# main.py imports this module first, so this is effectively process boot time
+_boot_started = time.perf_counter()
+
+_lock = threading.RLock()
+_instances: Dict[str, Any] = {}
+
+# Readiness state reported by /ready
+_state: Dict[str, Any] = {
+    "ready": False,
+    "error": None,
+    "warmup_attempts": 0,
+    "timings_ms": {},
+}
+
+
+def _get_or_create(name: str, factory):
+    inst = _instances.get(name)
+    if inst is not None:
+        return inst
+    with _lock:
+        inst = _instances.get(name)
+        if inst is None:
+            t0 = time.perf_counter()
+            inst = factory()
+            _state["timings_ms"][name] = round((time.perf_counter() - t0) * 1000, 1)
+            _instances[name] = inst
+    return inst
+
+
+# =========================
+# Embedding model
+# =========================
+def get_embedding_model():
+    """The configured EmbeddingBackend (sentence-transformers, onnx or onnx-int8)."""
+    def factory():
+        from services.embedding_backends import create_backend
+        return create_backend(EMBEDDING_BACKEND, EMBEDDING_MODEL_NAME, EMBEDDING_ONNX_DIR, EMBEDDING_THREADS)
+    return _get_or_create("embedding_model", factory)
+
+
+# =========================
+# Cross-encoder reranker
+# =========================
+def get_reranker():
+    """Shared sentence-transformers CrossEncoder on CPU."""
+    def factory():
+        from sentence_transformers import CrossEncoder
+        if RERANK_THREADS:
+            import torch
+            torch.set_num_threads(RERANK_THREADS)
+        return CrossEncoder(RERANK_MODEL_NAME, device="cpu", max_length=512)
+    return _get_or_create("reranker", factory)
+
+
+def is_loaded(name: str) -> bool:
+    return name in _instances
+
+
+# =========================
+# Qdrant clients
+# =========================
+def _qdrant_kwargs() -> Dict[str, Any]:
+    url = os.getenv("QDRANT_URL")
+    if url:
+        return {"url": url, "api_key": os.getenv("QDRANT_API_KEY")}
+    return {"host": os.getenv("QDRANT_HOST", "127.0.0.1"), "port": int(os.getenv("QDRANT_PORT", "6333"))}
+
+
+class _CountingClient:
+    """Thin proxy that counts every public client method call (see perf_metrics)."""
+
+    def __init__(self, client):
+        self._client = client
+
+    def __getattr__(self, name):
+        attr = getattr(self._client, name)
+        if name.startswith("_") or not callable(attr):
+            return attr
+
+        def call(*args, **kwargs):
+            count_qdrant_call(name)
+            return attr(*args, **kwargs)
+        return call
+
+
+def get_qdrant():
+    def factory():
+        from qdrant_client import QdrantClient
+        return _CountingClient(QdrantClient(**_qdrant_kwargs()))
+    return _get_or_create("qdrant", factory)
+
+
+def get_async_qdrant():
+    def factory():
+        from qdrant_client import AsyncQdrantClient
+        return _CountingClient(AsyncQdrantClient(**_qdrant_kwargs()))
+    return _get_or_create("async_qdrant", factory)
+
+
+# =========================
+# Gemini
+# =========================
+def get_gemini_model() -> Optional[Any]:
+    """Shared Gemini model, or None when GEMINI_API_KEY is not set."""
+    if not GEMINI_API_KEY:
+        return None
+
+    def factory():
+        import google.generativeai as genai
+        genai.configure(api_key=GEMINI_API_KEY)
+        return genai.GenerativeModel(GEMINI_MODEL_NAME)
+    return _get_or_create("gemini_model", factory)
+
+
+# =========================
+# Warm-up / readiness
+# =========================
+def warm_up():
+    """
+    Load the model, run one encode and connect Qdrant. Blocking: run it in a thread.
+    Safe to call again after a failure: whatever already loaded is reused.
+    """
+    from services.embedder import ensure_collection
+
+    t0 = time.perf_counter()
+    try:
+        model = get_embedding_model()
+        t1 = time.perf_counter()
+        model.encode(["warm up"])
+        _state["timings_ms"]["warmup_encode"] = round((time.perf_counter() - t1) * 1000, 1)
+        get_async_qdrant()
+        ensure_collection()
+        get_gemini_model()
+        if RERANK_ENABLED:
+            get_reranker().predict([("warm up", "warm up")])
+        _state["ready"] = True
+        _state["error"] = None
+    except Exception as e:
+        _state["error"] = str(e)
+        print(f"❌ Warm-up failed: {e}")
+    finally:
+        _state["warmup_attempts"] += 1
+        _state["timings_ms"]["warmup_total"] = round((time.perf_counter() - t0) * 1000, 1)
+
+
+def is_ready() -> bool:
+    return _state["ready"]
+
+
+def mark_app_started():
+    _state["timings_ms"]["boot_to_app_start"] = round((time.perf_counter() - _boot_started) * 1000, 1)
+
+
+def mark_first_request():
+    """Record cold start -> first served request, once."""
+    if "boot_to_first_request" in _state["timings_ms"]:
+        return
+    elapsed = round((time.perf_counter() - _boot_started) * 1000, 1)
+    _state["timings_ms"]["boot_to_first_request"] = elapsed
+    print(f"🚀 First request served {elapsed / 1000:.2f}s after boot.")
+
+
+def readiness() -> Dict[str, Any]:
+    return {
+        "ready": _state["ready"],
+        "error": _state["error"],
+        "warmup_attempts": _state["warmup_attempts"],
+        "loaded": sorted(_instances.keys()),
+        "embedding_backend": EMBEDDING_BACKEND,
+        "timings_ms": dict(_state["timings_ms"]),
+    }
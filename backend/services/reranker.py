@@ -0,0 +1,99 @@
+import asyncio
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, List, Optional
+
+from config import RERANK_TOP_N, RERANK_BUDGET_MS
+from services.perf_metrics import latencies
+from services.registry import get_reranker, is_loaded
+
+# One scoring thread: a second rerank queued behind a slow one would blow its budget anyway
+_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="rerank")
+_busy = threading.Lock()
+_loading = threading.Lock()
+
+# Exponential moving average of scoring cost per candidate (ms), learned from real calls
+_ms_per_candidate: Optional[float] = None
+_EMA_ALPHA = 0.2
+
+_stats: Dict[str, int] = {"reranked": 0, "skipped_cold": 0, "trimmed_budget": 0, "skipped_busy": 0, "timeouts": 0, "errors": 0}
+
+
+def _load_in_background():
+    if not _loading.acquire(blocking=False):
+        return
+
+    def run():
+        try:
+            get_reranker()
+        except Exception as e:
+            print(f"❌ Reranker load failed: {e}")
+        finally:
+            _loading.release()
+    threading.Thread(target=run, name="rerank-load", daemon=True).start()
+
+
+def _score(query: str, texts: List[str]) -> List[float]:
+    global _ms_per_candidate
+    with _busy:
+        t0 = time.perf_counter()
+        scores = get_reranker().predict([(query, t) for t in texts], batch_size=len(texts) or 1)
+        elapsed = (time.perf_counter() - t0) * 1000
+    per = elapsed / max(1, len(texts))
+    _ms_per_candidate = per if _ms_per_candidate is None else (1 - _EMA_ALPHA) * _ms_per_candidate + _EMA_ALPHA * per
+    latencies.record("rerank", elapsed)
+    return [float(s) for s in scores]
+
+
+async def rerank(query: str, chunks: List[Dict[str, Any]], top_n: int = RERANK_TOP_N,
+                 budget_ms: float = RERANK_BUDGET_MS) -> List[Dict[str, Any]]:
+    """
+    Score (query, chunk) pairs with the cross-encoder and keep the best `top_n`.
+    When the expected cost exceeds `budget_ms`, only the leading candidates that fit are
+    scored (always at least two, so the cost estimate keeps being refreshed and can recover
+    after a slow spell); the rest follow in retrieval order.
+    Falls back to the retrieval order (first `top_n`) when the model is not loaded yet,
+    the scorer is busy, or scoring overruns the budget.
+    """
+    if len(chunks) <= 1:
+        return chunks[:top_n]
+    if not is_loaded("reranker"):
+        _stats["skipped_cold"] += 1
+        _load_in_background()
+        return chunks[:top_n]
+    scored = chunks
+    if _ms_per_candidate is not None and _ms_per_candidate * len(chunks) > budget_ms:
+        scored = chunks[:max(2, int(budget_ms / _ms_per_candidate))]
+        _stats["trimmed_budget"] += 1
+    if _busy.locked():
+        _stats["skipped_busy"] += 1
+        return chunks[:top_n]
+
+    loop = asyncio.get_running_loop()
+    texts = [c.get("text", "") for c in scored]
+    try:
+        scores = await asyncio.wait_for(
+            loop.run_in_executor(_executor, _score, query, texts),
+            timeout=budget_ms / 1000.0,
+        )
+    except asyncio.TimeoutError:
+        # The scoring call finishes in the background and still updates the cost estimate
+        _stats["timeouts"] += 1
+        return chunks[:top_n]
+    except Exception as e:
+        _stats["errors"] += 1
+        print(f"❌ Rerank failed: {e}")
+        return chunks[:top_n]
+
+    ranked = sorted(zip(scores, scored), key=lambda p: p[0], reverse=True)[:top_n]
+    _stats["reranked"] += 1
+    return [{**c, "rerank_score": s} for s, c in ranked] + chunks[len(scored):][:top_n - len(ranked)]
+
+
+def reranker_stats() -> Dict[str, Any]:
+    return {
+        **_stats,
+        "loaded": is_loaded("reranker"),
+        "ms_per_candidate": round(_ms_per_candidate, 3) if _ms_per_candidate is not None else None,
+    }
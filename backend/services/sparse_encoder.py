@@ -0,0 +1,58 @@
+import re
+import zlib
+from collections import Counter
+from typing import Dict, List, Tuple
+
+# Keep error codes, model numbers, versions, paths and CLI flags as single terms:
+# "0x80070005", "xr-500", "v2.1.3", "--force", "/flushdns", "e:404"
+_TOKEN = re.compile(r"(?:--?|/)?[a-z0-9]+(?:[._:\-/][a-z0-9]+)*", re.IGNORECASE)
+
+_STOPWORDS = frozenset("""
+a an and are as at be but by can do does for from how i if in into is it its me my no not of on or
+our so that the their then there these this to was what when where which who why will with you your
+""".split())
+
+# BM25 term-frequency saturation; IDF is applied by Qdrant (Modifier.IDF)
+_K1 = 1.2
+_B = 0.75
+_AVG_DOC_TERMS = 120.0
+
+
+def _terms(text: str) -> List[str]:
+    terms = []
+    for tok in _TOKEN.findall((text or "").lower()):
+        if tok in _STOPWORDS or (len(tok) == 1 and not tok.isdigit()):
+            continue
+        terms.append(tok)
+        # Also index the parts of compound tokens so "xr-500" matches "xr 500"
+        if any(c in tok for c in "._:-/"):
+            terms.extend(p for p in re.split(r"[._:\-/]+", tok) if p and p not in _STOPWORDS)
+    return terms
+
+
+def _index(term: str) -> int:
+    return zlib.crc32(term.encode("utf-8")) & 0x7FFFFFFF
+
+
+def _to_sparse(weights: Dict[int, float]) -> Tuple[List[int], List[float]]:
+    indices = sorted(weights)
+    return indices, [weights[i] for i in indices]
+
+
+def encode_document(text: str) -> Tuple[List[int], List[float]]:
+    """BM25-style term weights for a chunk: (indices, values)."""
+    terms = _terms(text)
+    if not terms:
+        return [], []
+    dl = len(terms)
+    weights: Dict[int, float] = {}
+    for term, tf in Counter(terms).items():
+        w = tf * (_K1 + 1) / (tf + _K1 * (1 - _B + _B * dl / _AVG_DOC_TERMS))
+        idx = _index(term)
+        weights[idx] = weights.get(idx, 0.0) + w
+    return _to_sparse(weights)
+
+
+def encode_query(text: str) -> Tuple[List[int], List[float]]:
+    """Query side: every distinct term weighs 1; IDF comes from the collection."""
+    return _to_sparse({_index(t): 1.0 for t in set(_terms(text))})
@@ -1,11 +1,5 @@
-import google.generativeai as genai
-from config import GEMINI_API_KEY
-
-# Configure Gemini
-genai.configure(api_key=GEMINI_API_KEY)
-
-# Load Gemini model
-model = genai.GenerativeModel("gemini-2.0-flash")
+import anyio
+from services.registry import get_gemini_model
 
 def generate_summary(text):
     """
@@ -31,6 +25,9 @@ def generate_summary(text):
     """
     
     try:
+        model = get_gemini_model()
+        if model is None:
+            return "Error generating summary: Model not configured. Please set GEMINI_API_KEY."
         response = model.generate_content(prompt + input_text)
         summary = response.text.strip()
         
@@ -41,4 +38,8 @@ def generate_summary(text):
         return summary
         
     except Exception as e:
-        return f"Error generating summary: {str(e)}"
\ No newline at end of file
+        return f"Error generating summary: {str(e)}"
+
+async def generate_summary_async(text):
+    """Same as generate_summary, but keeps the blocking Gemini call off the event loop."""
+    return await anyio.to_thread.run_sync(generate_summary, text)
@@ -1,17 +1,48 @@
 # backend/services/user_service.py
 from db import users_col
-from auth import hash_password, verify_password
+from services.password_hasher import hash_password_async, verify_password_async
 from bson import ObjectId
+from config import AUTH_CACHE_SIZE, AUTH_CACHE_TTL
+from services.lru_cache import TTLLRUCache
 import datetime
 
+# =========================
+# Principal cache
+# =========================
+# user id -> user record (without the password hash), for get_current_user.
+# Invalidated on user updates in this process; the TTL bounds staleness in other workers.
+principal_cache = TTLLRUCache(AUTH_CACHE_SIZE, AUTH_CACHE_TTL)
+_PRINCIPAL_PROJECTION = {"password": 0}
+
+def invalidate_principal(user_id: str):
+    principal_cache.pop(user_id)
+
+async def get_principal(user_id: str):
+    """User record for an authenticated request, served from the principal cache when possible."""
+    if not user_id:
+        return None
+    cached = principal_cache.get(user_id)
+    if cached is not None:
+        return dict(cached)
+    try:
+        oid = ObjectId(user_id)
+    except Exception:
+        return None
+    user = await users_col.find_one({"_id": oid}, _PRINCIPAL_PROJECTION)
+    if not user:
+        return None
+    user["id"] = str(user["_id"])
+    principal_cache.set(user_id, user)
+    return dict(user)
+
 async def create_user(email: str, password: str, username: str | None = None):
-    existing = await users_col.find_one({"email": email})
+    existing = await users_col.find_one({"email": email}, {"_id": 1})
     if existing:
         return None
     doc = {
         "email": email,
         "username": username or "",
-        "password": hash_password(password),
+        "password": await hash_password_async(password),
         "created_at": datetime.datetime.utcnow(),
         "updated_at": datetime.datetime.utcnow(),
         "domain_filter": True  # default = strict tech-support mode
@@ -25,8 +56,12 @@ async def authenticate_user(email: str, password: str):
     user = await users_col.find_one({"email": email})
     if not user:
         return None
-    if not verify_password(password, user["password"]):
+    valid, new_hash = await verify_password_async(password, user["password"])
+    if not valid:
         return None
+    if new_hash:
+        # Cost parameters changed since this hash was made: upgrade it transparently
+        await users_col.update_one({"_id": user["_id"]}, {"$set": {"password": new_hash}})
     user["id"] = str(user["_id"])
     return user
 
@@ -50,5 +85,6 @@ async def get_user_by_id_str(id_str: str):
 
 async def set_domain_filter(user_id: str, flag: bool):
     await users_col.update_one({"_id": ObjectId(user_id)}, {"$set": {"domain_filter": bool(flag), "updated_at": datetime.datetime.utcnow()}})
+    invalidate_principal(user_id)
     u = await get_user_by_id_str(user_id)
     return u
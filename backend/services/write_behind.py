@@ -0,0 +1,160 @@
+import asyncio
+from typing import Any, Dict, List, Optional
+
+_STOP = object()
+
+
+class WriteBehindBuffer:
+    """
+    Buffers documents for one Mongo collection and writes them with insert_many,
+    once `max_batch` are waiting or the oldest has waited `flush_ms`.
+    The queue is bounded: when full, `policy="block"` makes callers wait and
+    `policy="drop"` discards the document (counted in stats).
+    """
+
+    def __init__(self, collection, max_batch: int = 50, flush_ms: float = 250.0,
+                 max_queue: int = 1000, policy: str = "block"):
+        if policy not in ("block", "drop"):
+            raise ValueError(f"Unknown write-behind policy: {policy}")
+        self._collection = collection
+        self.max_batch = max(1, max_batch)
+        self.flush_wait = max(0.0, flush_ms) / 1000.0
+        self.max_queue = max(1, max_queue)
+        self.policy = policy
+        self._queue: Optional[asyncio.Queue] = None
+        self._task: Optional[asyncio.Task] = None
+        self._closed = False
+
+        # Metrics
+        self._enqueued = 0
+        self._written = 0
+        self._dropped = 0
+        self._failed = 0
+        self._batches = 0
+
+    # -------------------------
+    # Public API
+    # -------------------------
+    async def add(self, doc: Dict[str, Any]) -> bool:
+        """Queue `doc` for writing. Returns False when it was dropped."""
+        if self._closed:
+            # After shutdown (or outside the app) fall back to a direct write
+            await self._collection.insert_one(doc)
+            self._written += 1
+            return True
+        self._ensure_running()
+        if self.policy == "drop":
+            try:
+                self._queue.put_nowait(doc)
+            except asyncio.QueueFull:
+                self._dropped += 1
+                return False
+        else:
+            await self._queue.put(doc)
+        self._enqueued += 1
+        return True
+
+    async def flush(self):
+        """Wait until everything queued before this call is written."""
+        if self._task is None or self._task.done():
+            return
+        marker = asyncio.get_running_loop().create_future()
+        await self._queue.put(marker)
+        await marker
+
+    async def close(self):
+        """Write everything still buffered, then stop; later adds write directly."""
+        if self._task is not None and not self._task.done():
+            await self._queue.put(_STOP)
+            await asyncio.gather(self._task, return_exceptions=True)
+        self._task = None
+        self._closed = True
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "queue_depth": self._queue.qsize() if self._queue is not None else 0,
+            "enqueued": self._enqueued,
+            "written": self._written,
+            "dropped": self._dropped,
+            "failed": self._failed,
+            "batches": self._batches,
+            "avg_batch_size": round(self._written / self._batches, 2) if self._batches else 0.0,
+            "policy": self.policy,
+        }
+
+    # -------------------------
+    # Internals
+    # -------------------------
+    def _ensure_running(self):
+        if self._task is None or self._task.done():
+            if self._queue is None:
+                self._queue = asyncio.Queue(maxsize=self.max_queue)
+            self._task = asyncio.create_task(self._flush_loop())
+
+    async def _flush_loop(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            batch: List[Dict[str, Any]] = []
+            markers: List[asyncio.Future] = []
+            stop = False
+
+            def take(item):
+                nonlocal stop
+                if item is _STOP:
+                    stop = True
+                elif isinstance(item, asyncio.Future):
+                    markers.append(item)
+                else:
+                    batch.append(item)
+
+            take(await self._queue.get())
+            deadline = loop.time() + self.flush_wait
+            while not stop and not markers and len(batch) < self.max_batch:
+                remaining = deadline - loop.time()
+                if remaining <= 0:
+                    break
+                try:
+                    take(await asyncio.wait_for(self._queue.get(), remaining))
+                except asyncio.TimeoutError:
+                    break
+            if stop:
+                # Drain whatever arrived before the stop request
+                while not self._queue.empty():
+                    item = self._queue.get_nowait()
+                    if item is not _STOP:
+                        take(item)
+            if batch:
+                await self._write(batch)
+            for marker in markers:
+                if not marker.done():
+                    marker.set_result(None)
+            if stop:
+                return
+
+    async def _write(self, batch: List[Dict[str, Any]]):
+        self._batches += 1
+        for attempt in range(2):
+            try:
+                await self._collection.insert_many(batch, ordered=False)
+                self._written += len(batch)
+                return
+            except Exception as e:
+                if attempt == 0:
+                    await asyncio.sleep(0.5)  # one retry; _ids are preset, so it can't duplicate
+                    continue
+                inserted, duplicates = _bulk_outcome(e)
+                # Duplicates were inserted by the first attempt
+                self._written += inserted + duplicates
+                lost = len(batch) - inserted - duplicates
+                if lost:
+                    self._failed += lost
+                    print(f"❌ Write-behind flush to {self._collection.name} lost {lost} docs: {e}")
+
+
+def _bulk_outcome(e: Exception):
+    """(inserted, duplicate-key errors) from a BulkWriteError; (0, 0) for other errors."""
+    details = getattr(e, "details", None)
+    if not isinstance(details, dict):
+        return 0, 0
+    duplicates = sum(1 for err in details.get("writeErrors") or [] if err.get("code") == 11000)
+    return int(details.get("nInserted", 0)), duplicates
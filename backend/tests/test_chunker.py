@@ -0,0 +1,28 @@
+from services.chunker import chunk_segment
+
+
+def _words(texts):
+    return [len(t.split()) for t in texts]
+
+
+def test_title_case_line_inside_a_sentence_is_not_a_heading():
+    text = "Connect the cable to the\nWAN Port On The Back\nof the router. Then power it on."
+    assert list(chunk_segment(text, 240, 40, _words)) == [
+        "Connect the cable to the WAN Port On The Back of the router. Then power it on."
+    ]
+
+
+def test_headings_still_open_chunks():
+    text = "Setup Guide\nConnect the cable. Then power it on.\nNetwork Settings\nOpen the admin page."
+    assert list(chunk_segment(text, 240, 40, _words)) == [
+        "Setup Guide Connect the cable. Then power it on.",
+        "Network Settings Open the admin page.",
+    ]
+
+
+def test_table_of_contents_respects_max_tokens():
+    toc = "\n".join(f"{i}. Chapter Title Number {i}" for i in range(1, 80))
+    chunks = list(chunk_segment(toc, 240, 40, _words))
+    assert len(chunks) > 1
+    assert all(len(c.split()) <= 240 for c in chunks)
+    assert " ".join(chunks) == " ".join(toc.splitlines())
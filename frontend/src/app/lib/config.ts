@@ -18,6 +18,7 @@ export const API_CONFIG = {
     // History endpoints
     HISTORY: {
       RECENT: "/history/recent",
+      EXPORT: "/history/export",
       CLEAR: "/history/clear",
     },
     // File endpoints
@@ -27,6 +28,10 @@ export const API_CONFIG = {
       DELETE: "/delete",
       RESET: "/reset",
     },
+    // Background ingestion jobs
+    JOBS: {
+      STATUS: "/jobs",
+    },
   },
 
   HEADERS: {
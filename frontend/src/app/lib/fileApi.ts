@@ -3,21 +3,41 @@
 
 import { apiClient } from './apiClient';
 import { API_CONFIG } from './config';
-import { UploadResponse } from '../types';
+import { UploadResponse, JobAccepted, JobStatus } from '../types';
+
+const JOB_POLL_INTERVAL_MS = 1500;
+
+// Uploads are processed in the background; poll the job until it finishes.
+async function waitForJob<T>(jobId: string): Promise<T> {
+  while (true) {
+    const job = await apiClient.get<JobStatus>(
+      `${API_CONFIG.ENDPOINTS.JOBS.STATUS}/${encodeURIComponent(jobId)}`
+    );
+    if (job.status === 'done') {
+      return job.result as T;
+    }
+    if (job.status === 'failed') {
+      throw new Error(job.error || 'Processing failed');
+    }
+    await new Promise((resolve) => setTimeout(resolve, JOB_POLL_INTERVAL_MS));
+  }
+}
 
 export const fileApi = {
   async uploadFile(file: File): Promise<UploadResponse> {
-    return apiClient.upload<UploadResponse>(
+    const job = await apiClient.upload<JobAccepted>(
       API_CONFIG.ENDPOINTS.FILES.UPLOAD,
       file
     );
+    return waitForJob<UploadResponse>(job.job_id);
   },
 
   async uploadUrl(url: string): Promise<{ url: string; title?: string; summary: string }>{
-    return apiClient.post(
+    const job = await apiClient.post<JobAccepted>(
       API_CONFIG.ENDPOINTS.FILES.UPLOAD_URL,
       { url }
     );
+    return waitForJob<{ url: string; title?: string; summary: string }>(job.job_id);
   },
 
   async deleteFile(filename: string): Promise<{ success: boolean; message: string }> {
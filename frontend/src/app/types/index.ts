@@ -39,6 +39,28 @@ export interface User {
     filename: string;
     summary: string;
   }
+
+  export interface JobAccepted {
+    job_id: string;
+    status: string;
+    kind: string;
+    source: string;
+  }
+
+  export interface JobStatus extends JobAccepted {
+    stage: string;
+    progress: {
+      pages_extracted: number;
+      chunks_total: number;
+      chunks_embedded: number;
+      chunks_skipped: number;
+      chunks_deleted: number;
+      summary_ready: boolean;
+      extraction_cached: boolean;
+    };
+    result?: Record<string, any> | null;
+    error?: string | null;
+  }
   
   export interface Message {
     id: string;
@@ -70,6 +92,7 @@ export interface User {
   
   export interface HistoryResponse {
     messages: HistoryMessage[];
+    next_cursor?: string | null;
   }
   
   export interface ApiError {